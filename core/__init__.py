@@ -1,3 +1,4 @@
+from .parsed_document import ParsedDocument
 from .pdf_processor import (
     process_factura_venta,
     process_factura_compra,
@@ -5,15 +6,22 @@ from .pdf_processor import (
     process_facturas_gastos,
     process_nota_credito,
     process_nota_debito,
-    process_inventory
+    process_inventory,
+    process_document,
+    DocumentSpec,
+    DOCUMENT_SPECS
 )
 
 __all__ = [
+    'ParsedDocument',
     'process_factura_venta',
     'process_factura_compra',
     'process_facturas_compras_nuevos',
     'process_facturas_gastos',
     'process_nota_credito',
     'process_nota_debito',
-    'process_inventory'
+    'process_inventory',
+    'process_document',
+    'DocumentSpec',
+    'DOCUMENT_SPECS'
 ]
\ No newline at end of file
@@ -0,0 +1,216 @@
+import logging
+import queue
+import threading
+import time
+
+from seleniumbase import SB
+
+from core.download_stage import SEARCH_URL
+from core.wait_engine import WaitEngine, INPUT_CUFE, page_loaded, captcha_cleared, element_present
+
+try:
+    import psutil
+except ImportError:  # Está en requirements.txt; sin él no se recicla por memoria (se avisa)
+    psutil = None
+
+SB_OPTIONS = {
+    "uc": True,
+    "test": True,
+    "incognito": True,
+    "locale_code": "en"
+}
+
+# Reciclaje de la sesión para que Chrome no acumule memoria en corridas largas
+MAX_CUFES_PER_SESSION = 50
+MAX_RSS_MB = 1500
+# Un CAPTCHA de Turnstile vence a los 300 s: un navegador precalentado más
+# viejo que esto vuelve a cargar la búsqueda antes de usarse
+WARM_MAX_AGE = 240
+
+
+class BrowserSession:
+    """Ciclo de vida de un navegador SeleniumBase: lo recicla cada cierto número
+    de CUFEs o al superar un umbral de memoria, y lo reinicia si se cae"""
+
+    # El aviso de que falta psutil se registra una sola vez
+    memory_warning_shown = False
+
+    def __init__(self, max_cufes=MAX_CUFES_PER_SESSION, max_rss_mb=MAX_RSS_MB, options=None):
+        self.max_cufes = max_cufes
+        self.max_rss_mb = max_rss_mb
+        if max_rss_mb and psutil is None and not BrowserSession.memory_warning_shown:
+            BrowserSession.memory_warning_shown = True
+            logging.warning(f"psutil no está instalado: el navegador no se recicla al superar "
+                            f"{max_rss_mb} MB, solo cada {max_cufes} CUFEs (pip install psutil)")
+        self.options = dict(SB_OPTIONS, **(options or {}))
+        self.context = None
+        self.sb = None
+        self.processed = 0
+        self.restarts = 0
+        self.peak_rss_mb = 0.0
+        # Momento en que WarmBrowserPool dejó la búsqueda lista (un solo uso)
+        self.fresh_at = None
+
+    def start(self):
+        self.context = SB(**self.options)
+        self.sb = self.context.__enter__()
+        self.processed = 0
+        self.fresh_at = None
+        return self.sb
+
+    def mark_fresh(self):
+        self.fresh_at = time.monotonic()
+
+    def take_fresh(self, max_age=WARM_MAX_AGE):
+        """True si la página de búsqueda y su CAPTCHA sin usar vienen del
+        precalentamiento y aún no vencen; después de consultarla ya no lo están"""
+        fresh_at, self.fresh_at = self.fresh_at, None
+        return fresh_at is not None and time.monotonic() - fresh_at < max_age
+
+    def close(self):
+        if self.context is None:
+            return
+        try:
+            self.context.__exit__(None, None, None)
+        except Exception as e:
+            logging.warning(f"Error cerrando el navegador: {str(e)}")
+        finally:
+            self.context = None
+            self.sb = None
+
+    def restart(self, reason):
+        logging.info(f"Reiniciando navegador: {reason}")
+        self.close()
+        self.restarts += 1
+        return self.start()
+
+    def acquire(self):
+        """Navegador listo para el siguiente CUFE (lo crea o recicla si hace falta)"""
+        if self.sb is None:
+            return self.start()
+
+        if self.processed >= self.max_cufes:
+            return self.restart(f"reciclaje después de {self.processed} CUFEs")
+
+        rss = self.rss_mb()
+        if self.max_rss_mb and rss > self.max_rss_mb:
+            return self.restart(f"memoria {rss:.0f} MB supera {self.max_rss_mb} MB")
+
+        return self.sb
+
+    def mark_done(self):
+        self.processed += 1
+
+    def is_alive(self):
+        """False si Chrome o el driver dejaron de responder"""
+        if self.sb is None:
+            return False
+        try:
+            self.sb.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def root_pids(self):
+        """Procesos raíz de la sesión: chromedriver y, en modo UC, Chrome, que
+        SeleniumBase lanza aparte (no es hijo de chromedriver)"""
+        driver = self.sb.driver
+        pids = []
+        service = getattr(driver, "service", None)
+        process = getattr(service, "process", None)
+        if process is not None:
+            pids.append(process.pid)
+        browser_pid = getattr(driver, "browser_pid", None)
+        if browser_pid:
+            pids.append(browser_pid)
+        return pids
+
+    def rss_mb(self):
+        """Memoria residente de chromedriver y todos los procesos de Chrome"""
+        if psutil is None or self.sb is None:
+            return 0.0
+        try:
+            processes = {}
+            for pid in self.root_pids():
+                try:
+                    root = psutil.Process(pid)
+                    tree = [root] + root.children(recursive=True)
+                except psutil.Error:
+                    continue
+                # Cada proceso se cuenta una vez aunque aparezca en los dos árboles
+                processes.update((process.pid, process) for process in tree)
+            total = 0
+            for process in processes.values():
+                try:
+                    total += process.memory_info().rss
+                except psutil.Error:
+                    continue
+        except Exception:
+            return 0.0
+
+        rss = total / (1024 * 1024)
+        self.peak_rss_mb = max(self.peak_rss_mb, rss)
+        return rss
+
+
+def on_search_page(sb):
+    """True si el navegador ya está en la búsqueda con el campo CUFE disponible"""
+    try:
+        return (sb.get_current_url().split("?")[0] == SEARCH_URL
+                and element_present(sb.driver, INPUT_CUFE))
+    except Exception:
+        return False
+
+
+class WarmBrowserPool:
+    """Navegadores que se inician en segundo plano al abrir la aplicación y
+    esperan en la página de búsqueda con el CAPTCHA resuelto, para que la
+    primera descarga no pague el arranque de Chrome"""
+
+    def __init__(self, size=1):
+        self.size = size
+        self.ready = queue.Queue()
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.size):
+            threading.Thread(target=self.warm, name=f"precalentar-{i + 1}", daemon=True).start()
+
+    def warm(self):
+        session = BrowserSession()
+        try:
+            sb = session.start()
+            waits = WaitEngine()
+            sb.uc_open_with_reconnect(SEARCH_URL, 4)
+            waits.wait_for("pagina_cargada", lambda: page_loaded(sb.driver))
+            sb.uc_gui_click_captcha()
+            waits.wait_for("captcha_resuelto", lambda: captcha_cleared(sb.driver))
+            session.mark_fresh()
+            logging.info("Navegador precalentado listo")
+        except Exception as e:
+            logging.warning(f"No se pudo precalentar el navegador: {str(e)}")
+            session.close()
+            return
+
+        with self.lock:
+            if not self.closed:
+                self.ready.put(session)
+                return
+        session.close()
+
+    def take(self, count):
+        """Entrega hasta `count` sesiones que ya estén listas (sin esperar)"""
+        sessions = []
+        while len(sessions) < count:
+            try:
+                sessions.append(self.ready.get_nowait())
+            except queue.Empty:
+                break
+        return sessions
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+        for session in self.take(self.ready.qsize()):
+            session.close()
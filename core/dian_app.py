@@ -7,9 +7,11 @@ from PyQt5 import QtCore
 import pandas as pd
 import os
 import logging
-import time
 import requests
 from pdf_processor import process_downloaded_pdfs
+from job_journal import JobJournal, pdf_filename
+from wait_engine import (WaitEngine, INPUT_CUFE, page_loaded, captcha_cleared,
+                         element_present, url_has_token)
 
 class ConfigDialog(QDialog):
     def __init__(self, parent=None):
@@ -162,42 +164,38 @@ class DianDownloaderGUI(QMainWindow):
         logger.addHandler(self.log_handler)
         logger.setLevel(logging.INFO)
 
-    def process_cufe(self, sb, cufe):
+    def process_cufe(self, sb, cufe, waits=None):
+        waits = waits or WaitEngine()
         try:
             url = "https://catalogo-vpfe.dian.gov.co/User/SearchDocument"
             logging.info(f"Procesando CUFE: {cufe}")
             
             sb.uc_open_with_reconnect(url, 4)
-            time.sleep(3)
+            waits.wait_for("pagina_cargada", lambda: page_loaded(sb.driver))
 
             logging.info("Resolviendo primer CAPTCHA...")
             max_captcha_attempts = 3
             for captcha_attempt in range(max_captcha_attempts):
                 try:
                     sb.uc_gui_click_captcha()
-                    time.sleep(4)
+                    waits.wait_for("captcha_resuelto", lambda: captcha_cleared(sb.driver))
                     break
                 except Exception as e:
                     if captcha_attempt == max_captcha_attempts - 1:
                         raise Exception(f"No se pudo resolver el primer CAPTCHA después de {max_captcha_attempts} intentos")
                     logging.warning(f"Error resolviendo el primer CAPTCHA (Intento {captcha_attempt+1}): {str(e)}")
-                    time.sleep(2)
 
-            input_field = "input[placeholder='Ingrese el código CUFE o UUID']"
-            sb.type(input_field, cufe)
-            time.sleep(2)
+            waits.wait_for("campo_busqueda", lambda: element_present(sb.driver, INPUT_CUFE))
+            sb.type(INPUT_CUFE, cufe)
 
             sb.click("button:contains('Buscar')")
-            time.sleep(5)
+            waits.wait_for("token_en_url", lambda: url_has_token(sb.driver))
 
             current_url = sb.get_current_url()
             logging.info(f"URL capturada: {current_url}")
             self.current_url = current_url
             self.url_text.setText(current_url)
 
-            with open("urls.txt", "a") as file:
-                file.write(f"{cufe}: {current_url}\n")
-
             token = None
             if "Token=" in current_url:
                 token = current_url.split("Token=")[1].split("&")[0]
@@ -205,23 +203,24 @@ class DianDownloaderGUI(QMainWindow):
                 token = current_url.split("token=")[1].split("&")[0]
 
             if token:
+                self.journal.mark_token(cufe, token)
                 download_url = f"https://catalogo-vpfe.dian.gov.co/Document/DownloadPDF?trackId={cufe}&token={token}"
                 response = requests.get(download_url)
                 
                 if response.status_code == 200:
                     excel_name = os.path.splitext(os.path.basename(self.excel_path))[0]
-                    filename = f"{excel_name}_{cufe}.pdf"
+                    filename = pdf_filename(excel_name, cufe)
                     filepath = os.path.join(self.folder_path, filename)
                     with open(filepath, "wb") as file:
                         file.write(response.content)
                     logging.info(f"Archivo PDF descargado: {filename}")
-                    
-                    with open(os.path.join(self.folder_path, "links_descarga.txt"), "a") as file:
-                        file.write(download_url + "\n")
+                    self.journal.mark_downloaded(cufe, download_url)
                 else:
                     logging.error(f"Error al descargar el archivo PDF para el CUFE {cufe}")
+                    self.journal.mark_failed(cufe, f"HTTP {response.status_code}")
             else:
                 logging.error(f"No se encontró el token en la URL para el CUFE {cufe}")
+                self.journal.mark_failed(cufe, "No se obtuvo token")
 
             return True
 
@@ -242,22 +241,24 @@ class DianDownloaderGUI(QMainWindow):
             self.btn_stop.setEnabled(True)
             
             df = pd.read_excel(self.excel_path, sheet_name='Token')
-            cufes = df['CUFE/CUDE'].dropna().tolist()
+            excel_name = os.path.splitext(os.path.basename(self.excel_path))[0]
+
+            # Reanudar: se omiten los CUFEs ya descargados en corridas anteriores
+            self.journal = JobJournal(self.folder_path)
+            self.journal.add_pending(df['CUFE/CUDE'].dropna().tolist(), excel_name)
+            cufes = self.journal.remaining(df['CUFE/CUDE'].dropna().tolist())
 
             progress = QProgressDialog("Procesando documentos...", "Cancelar", 0, len(cufes), self)
             progress.setWindowModality(QtCore.Qt.WindowModal)
 
-            excel_name = os.path.splitext(os.path.basename(self.excel_path))[0]
-
-            with open(os.path.join(self.folder_path, "links_descarga.txt"), "w") as file:
-                pass
-
+            waits = WaitEngine()
             with SB(uc=True, test=True, incognito=True, locale_code="en") as sb:
                 for i, cufe in enumerate(cufes):
                     if not self.is_processing:
                         break
 
-                    success = self.process_cufe(sb, cufe)
+                    self.journal.start_attempt(cufe)
+                    success = self.process_cufe(sb, cufe, waits)
                     progress.setValue(i + 1)
                     self.status_label.setText(f'Estado: Procesado {i+1} de {len(cufes)}')
                     QApplication.processEvents()
@@ -267,6 +268,8 @@ class DianDownloaderGUI(QMainWindow):
                         break
 
             progress.close()
+            if waits.timings:
+                logging.info(f"Tiempos por paso:\n{waits.summary()}")
             
             if not self.is_processing:
                 QMessageBox.information(self, "Detenido", "Proceso detenido por el usuario")
@@ -277,6 +280,9 @@ class DianDownloaderGUI(QMainWindow):
             QMessageBox.critical(self, "Error", f"Error en el proceso: {str(e)}")
             logging.error(f"Error en proceso principal: {str(e)}")
         finally:
+            if getattr(self, 'journal', None):
+                self.journal.close()
+                self.journal = None
             self.is_processing = False
             self.btn_start.setEnabled(True)
             self.btn_stop.setEnabled(False)
@@ -1,10 +1,22 @@
 from seleniumbase import SB
-import time
 import os
 import logging
 import requests
+from core.job_journal import JobJournal, pdf_filename
+from core.wait_engine import (WaitEngine, INPUT_CUFE, page_loaded, captcha_cleared,
+                              url_has_token)
 
-def process_cufe(self, driver, cufe):
+def process_cufe(self, driver, cufe, waits=None):
+        waits = waits or WaitEngine()
+        excel_name = os.path.splitext(os.path.basename(self.excel_path))[0]
+        # Se usa el journal de quien llama (dian_app.start_process abre uno); si no
+        # tiene, se abre el de la carpeta de descarga solo para este CUFE
+        journal = getattr(self, "journal", None)
+        own_journal = journal is None
+        if own_journal:
+            journal = JobJournal(self.folder_path)
+            journal.add_pending([cufe], excel_name)
+            journal.start_attempt(cufe)
         try:
             from selenium.webdriver.common.by import By
             from selenium.webdriver.support.ui import WebDriverWait
@@ -14,7 +26,7 @@ def process_cufe(self, driver, cufe):
             logging.info(f"Procesando CUFE: {cufe}")
             
             driver.get(url)
-            time.sleep(3)
+            waits.wait_for("pagina_cargada", lambda: page_loaded(driver))
 
             logging.info("Esperando CAPTCHA...")
             # Esperar a que el iframe del CAPTCHA esté presente
@@ -28,28 +40,24 @@ def process_cufe(self, driver, cufe):
                     # Hacer clic en el checkbox
                     checkbox = wait.until(EC.element_to_be_clickable((By.CLASS_NAME, "recaptcha-checkbox-border")))
                     checkbox.click()
-                    time.sleep(4)  # Esperar a que se resuelva
                     driver.switch_to.default_content()
+                    # Esperar a que se resuelva
+                    waits.wait_for("captcha_resuelto", lambda: captcha_cleared(driver))
                     break
 
             # Ingresar CUFE
-            input_field = wait.until(EC.presence_of_element_located(
-                (By.CSS_SELECTOR, "input[placeholder='Ingrese el código CUFE o UUID']")))
+            input_field = waits.wait_for("campo_busqueda", lambda: driver.find_element(By.CSS_SELECTOR, INPUT_CUFE))
             input_field.send_keys(cufe)
-            time.sleep(2)
 
             # Buscar
             search_button = wait.until(EC.element_to_be_clickable(
                 (By.XPATH, "//button[contains(text(),'Buscar')]")))
             search_button.click()
-            time.sleep(5)
+            waits.wait_for("token_en_url", lambda: url_has_token(driver))
 
             current_url = driver.current_url
             logging.info(f"URL capturada: {current_url}")
 
-            with open("urls.txt", "a") as file:
-                file.write(f"{cufe}: {current_url}\n")
-
             token = None
             if "Token=" in current_url:
                 token = current_url.split("Token=")[1].split("&")[0]
@@ -57,26 +65,29 @@ def process_cufe(self, driver, cufe):
                 token = current_url.split("token=")[1].split("&")[0]
 
             if token:
+                journal.mark_token(cufe, token)
                 download_url = f"https://catalogo-vpfe.dian.gov.co/Document/DownloadPDF?trackId={cufe}&token={token}"
                 response = requests.get(download_url)
                 
                 if response.status_code == 200:
-                    excel_name = os.path.splitext(os.path.basename(self.excel_path))[0]
-                    filename = f"{excel_name}_{cufe}.pdf"
+                    filename = pdf_filename(excel_name, cufe)
                     filepath = os.path.join(self.folder_path, filename)
                     with open(filepath, "wb") as file:
                         file.write(response.content)
                     logging.info(f"Archivo PDF descargado: {filename}")
-                    
-                    with open(os.path.join(self.folder_path, "links_descarga.txt"), "a") as file:
-                        file.write(download_url + "\n")
+                    journal.mark_downloaded(cufe, download_url)
                 else:
                     logging.error(f"Error al descargar el archivo PDF para el CUFE {cufe}")
+                    journal.mark_failed(cufe, f"HTTP {response.status_code}")
             else:
                 logging.error(f"No se encontró el token en la URL para el CUFE {cufe}")
+                journal.mark_failed(cufe, "No se obtuvo token")
 
             return True
 
         except Exception as e:
             logging.error(f"Error procesando CUFE {cufe}: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+        finally:
+            if own_journal:
+                journal.close()
\ No newline at end of file
@@ -0,0 +1,135 @@
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.job_journal import pdf_filename
+
+# Se puede apuntar a un portal local (tools/mock_dian_server.py) para pruebas y benchmarks
+DIAN_BASE_URL = os.environ.get("DIAN_BASE_URL", "https://catalogo-vpfe.dian.gov.co").rstrip("/")
+SEARCH_URL = f"{DIAN_BASE_URL}/User/SearchDocument"
+DOWNLOAD_URL = f"{DIAN_BASE_URL}/Document/DownloadPDF?trackId={{cufe}}&token={{token}}"
+
+# Descargas HTTP simultáneas por defecto
+DEFAULT_DOWNLOAD_WORKERS = 4
+REQUEST_TIMEOUT = 60
+CHUNK_SIZE = 64 * 1024
+# El marcador %%EOF debe aparecer cerca del final del archivo
+EOF_WINDOW = 1024
+
+
+class InvalidPDFError(Exception):
+    """La respuesta de la DIAN no es un PDF completo"""
+
+
+def extract_token(url):
+    """Obtiene el Token de una URL de ShowDocumentToPublic (None si no lo tiene)"""
+    for key in ("Token=", "token="):
+        if key in url:
+            return url.split(key)[1].split("&")[0]
+    return None
+
+
+class PDFDownloadStage:
+    """Etapa de descarga: recibe pares (cufe, token) y baja los PDFs en paralelo
+    reutilizando conexiones, sin bloquear al navegador que captura los tokens"""
+
+    def __init__(self, folder_path, excel_name, max_workers=DEFAULT_DOWNLOAD_WORKERS, journal=None):
+        self.folder_path = folder_path
+        self.excel_name = excel_name
+        self.journal = journal
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="descarga-pdf")
+
+    def submit(self, cufe, token):
+        """Encola la descarga; retorna un Future que resuelve a True/False"""
+        return self.executor.submit(self.download, cufe, token)
+
+    def download(self, cufe, token):
+        """Descarga el PDF de un CUFE con su token"""
+        download_url = DOWNLOAD_URL.format(cufe=cufe, token=token)
+        start = time.monotonic()
+        try:
+            with self.session.get(download_url, timeout=REQUEST_TIMEOUT, stream=True) as response:
+                if response.status_code != 200:
+                    logging.error(f"Error al descargar el archivo PDF para el CUFE {cufe} "
+                                  f"(HTTP {response.status_code})")
+                    self.record_failure(cufe, f"HTTP {response.status_code}")
+                    return False
+
+                filename = pdf_filename(self.excel_name, cufe)
+                filepath = os.path.join(self.folder_path, filename)
+                self.save_stream(response, filepath)
+
+            logging.info(f"Archivo PDF descargado: {filename}")
+
+            if self.journal:
+                self.journal.mark_downloaded(cufe, download_url, time.monotonic() - start)
+            return True
+
+        except InvalidPDFError as e:
+            # Con un token vencido la DIAN responde una página HTML en lugar del PDF
+            logging.warning(f"La respuesta para el CUFE {cufe} no es válida: {str(e)}")
+            self.record_failure(cufe, str(e))
+            return False
+
+        except Exception as e:
+            logging.error(f"Error descargando PDF del CUFE {cufe}: {str(e)}")
+            self.record_failure(cufe, str(e))
+            return False
+
+    def save_stream(self, response, filepath):
+        """Escribe el cuerpo por bloques en un temporal de la misma carpeta, validando
+        que sea un PDF completo, y lo renombra de forma atómica al nombre final"""
+        # Con compresión el tamaño decodificado no coincide con Content-Length
+        expected = response.headers.get("Content-Length")
+        if response.headers.get("Content-Encoding", "identity") != "identity":
+            expected = None
+        expected = int(expected) if expected and expected.isdigit() else None
+
+        fd, temp_path = tempfile.mkstemp(prefix=".descarga_", suffix=".part", dir=self.folder_path)
+        try:
+            size = 0
+            tail = b""
+            with os.fdopen(fd, "wb") as file:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    if size == 0 and not chunk.startswith(b"%PDF"):
+                        raise InvalidPDFError("Respuesta no es PDF")
+                    file.write(chunk)
+                    size += len(chunk)
+                    tail = (tail + chunk)[-EOF_WINDOW:]
+
+                if size == 0:
+                    raise InvalidPDFError("Respuesta vacía")
+                if expected is not None and size != expected:
+                    raise InvalidPDFError(f"Descarga incompleta ({size} de {expected} bytes)")
+                if b"%%EOF" not in tail:
+                    raise InvalidPDFError("PDF truncado (sin %%EOF)")
+
+                file.flush()
+                os.fsync(file.fileno())
+
+            os.replace(temp_path, filepath)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def record_failure(self, cufe, error):
+        if self.journal:
+            self.journal.mark_failed(cufe, error)
+
+    def close(self, wait=True):
+        """Espera las descargas pendientes y libera las conexiones"""
+        self.executor.shutdown(wait=wait)
+        self.session.close()
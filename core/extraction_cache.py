@@ -0,0 +1,170 @@
+"""Caché persistente de resultados de extracción.
+
+Uso desde consola:
+    python -m core.extraction_cache --estado
+    python -m core.extraction_cache --invalidar factura1.pdf factura2.pdf
+    python -m core.extraction_cache --limpiar
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from .pdf_processor import EXTRACTOR_VERSION
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".aplicativo_dian")
+CACHE_FILENAME = "cache_extraccion.sqlite"
+MAX_CACHE_MB = 256
+HASH_CHUNK_SIZE = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    file_hash TEXT NOT NULL,
+    doc_type TEXT NOT NULL,
+    version TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL,
+    last_used REAL,
+    PRIMARY KEY (file_hash, doc_type, version)
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used);
+"""
+
+
+def file_hash(path):
+    """SHA-256 del contenido del archivo"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while True:
+            chunk = file.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """Resultados de extracción indexados por hash del contenido + tipo de
+    documento + versión del extractor, con desalojo LRU por tamaño.
+
+    Un PDF ya procesado (aunque se haya renombrado o movido) no se vuelve a
+    analizar; cambiar EXTRACTOR_VERSION descarta las entradas anteriores.
+    """
+
+    def __init__(self, path=None, max_mb=MAX_CACHE_MB):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, CACHE_FILENAME)
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def get(self, digest, doc_type):
+        """Resultado guardado o None; marca la entrada como usada"""
+        rows = self.execute(
+            "SELECT payload FROM entries WHERE file_hash = ? AND doc_type = ? AND version = ?",
+            (digest, doc_type, EXTRACTOR_VERSION)
+        )
+        if not rows:
+            return None
+        self.execute(
+            "UPDATE entries SET last_used = ? WHERE file_hash = ? AND doc_type = ? AND version = ?",
+            (time.time(), digest, doc_type, EXTRACTOR_VERSION)
+        )
+        try:
+            return pickle.loads(rows[0][0])
+        except Exception:
+            # Entrada corrupta: se descarta y se vuelve a extraer
+            self.invalidate_hash(digest)
+            return None
+
+    def put(self, digest, doc_type, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        self.execute(
+            "INSERT OR REPLACE INTO entries "
+            "(file_hash, doc_type, version, payload, size, created_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (digest, doc_type, EXTRACTOR_VERSION, sqlite3.Binary(payload), len(payload), now, now)
+        )
+        self.evict()
+
+    def evict(self):
+        """Elimina las entradas menos usadas hasta quedar bajo el límite"""
+        with self.lock:
+            # Las de versiones anteriores del extractor ya no sirven
+            self.conn.execute("DELETE FROM entries WHERE version != ?", (EXTRACTOR_VERSION,))
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self.conn.execute(
+                "SELECT file_hash, doc_type, version, size FROM entries ORDER BY last_used"
+            ).fetchall()
+            self.conn.execute("BEGIN")
+            for digest, doc_type, version, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self.conn.execute(
+                    "DELETE FROM entries WHERE file_hash = ? AND doc_type = ? AND version = ?",
+                    (digest, doc_type, version)
+                )
+                total -= size
+            self.conn.execute("COMMIT")
+
+    def invalidate_hash(self, digest):
+        self.execute("DELETE FROM entries WHERE file_hash = ?", (digest,))
+
+    def invalidate(self, path):
+        """Descarta lo guardado para un archivo (todos los tipos de documento)"""
+        self.invalidate_hash(file_hash(path))
+
+    def clear(self):
+        self.execute("DELETE FROM entries")
+        self.execute("VACUUM")
+
+    def stats(self):
+        """Cantidad de entradas y tamaño total en bytes"""
+        count, size = self.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries")[0]
+        return {"entradas": count, "bytes": size}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caché de extracción de PDFs")
+    parser.add_argument("--estado", action="store_true", help="Muestra entradas y tamaño")
+    parser.add_argument("--invalidar", nargs="+", metavar="PDF",
+                        help="Descarta los resultados guardados de estos archivos")
+    parser.add_argument("--limpiar", action="store_true", help="Vacía toda la caché")
+    args = parser.parse_args()
+
+    cache = ExtractionCache()
+    try:
+        if args.limpiar:
+            cache.clear()
+            print("Caché vaciada")
+        for path in args.invalidar or []:
+            cache.invalidate(path)
+            print(f"Invalidado: {path}")
+        stats = cache.stats()
+        print(f"{cache.path}: {stats['entradas']} entradas, {stats['bytes'] / (1024 * 1024):.1f} MB")
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import os
+import traceback
+
+from .extraction_cache import file_hash
+from .layout_templates import LayoutTemplateStore
+from .parsed_document import ParsedDocument
+from .text_backend import default_backend
+from .ubl_document import UblDocument, is_xml_source
+from .word_grid import default_item_engine
+from .worker_pool import DEFAULT_MAX_MEMORY_MB, DEFAULT_TIMEOUT, IsolatedWorkerPool
+from .pdf_processor import (document_facts, infer_own_nit, normalize_nit,
+                            resolve_document_type, DOCUMENT_SPECS, run_spec)
+
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# Modo que clasifica cada archivo y lo envía al procesador de su tipo
+AUTO_TYPE = 'Automático'
+# Entrada de la caché con los datos de clasificación de cada archivo
+CLASSIFICATION_TYPE = 'clasificacion'
+
+# Plantillas de emisores del proceso actual (cada proceso del pool abre la suya)
+_templates = None
+
+
+class ExtractionResult:
+    """Resultado de extraer un documento"""
+
+    def __init__(self, path, doc_type, rows=None, descuentos=None, inventory=None, error=None):
+        self.path = path
+        self.doc_type = doc_type
+        self.rows = rows or []
+        self.descuentos = descuentos or []
+        self.inventory = inventory or []
+        self.error = error
+        self.cached = False
+
+    def to_cache(self):
+        return (self.rows, self.descuentos, self.inventory)
+
+    @classmethod
+    def from_cache(cls, path, doc_type, value):
+        rows, descuentos, inventory = value
+        result = cls(path, doc_type, rows, descuentos, inventory)
+        result.cached = True
+        return result
+
+    @property
+    def filename(self):
+        return os.path.basename(self.path)
+
+    @property
+    def key(self):
+        """Clave de processed_data donde van las filas de su tipo"""
+        spec = DOCUMENT_SPECS.get(self.doc_type)
+        return spec.key if spec else None
+
+
+def worker_templates():
+    """Almacén de plantillas de este proceso; None si no se pudo abrir"""
+    global _templates
+    if _templates is None:
+        try:
+            _templates = LayoutTemplateStore()
+        except Exception as e:
+            print(f"No se pudieron abrir las plantillas de emisores: {str(e)}")
+            _templates = False
+    return _templates or None
+
+
+def extract_document(path, doc_type, item_engine=None, text_backend=None):
+    """Extrae un documento completo; se ejecuta dentro de un proceso del pool"""
+    spec = DOCUMENT_SPECS.get(doc_type)
+    if not spec:
+        return ExtractionResult(path, doc_type, error='Tipo de documento no reconocido')
+
+    try:
+        if is_xml_source(path):
+            document = UblDocument(path)
+        else:
+            document = ParsedDocument(path, text_backend, templates=worker_templates(),
+                                      item_engine=item_engine)
+        with document:
+            rows, descuentos, inventory = run_spec(spec, document)
+    except Exception as e:
+        traceback.print_exc()
+        return ExtractionResult(path, doc_type, error=str(e))
+
+    if not rows:
+        return ExtractionResult(path, doc_type, error='No se pudo procesar')
+    return ExtractionResult(path, doc_type, rows, descuentos, inventory)
+
+
+def classify_document(path):
+    """Datos de clasificación de un archivo; se ejecuta dentro de un proceso del pool"""
+    return document_facts(path)
+
+
+class ExtractionEngine:
+    """Extrae PDFs en paralelo con procesos aislados.
+
+    pdfplumber es Python puro y limitado por CPU: con un proceso por núcleo
+    el rendimiento escala casi linealmente con la cantidad de núcleos. Cada
+    documento tiene un tiempo máximo (`timeout`, segundos) y su proceso una
+    memoria máxima (`max_memory_mb`); si se exceden, o el proceso se cae, el
+    documento sale con error y el proceso se reemplaza.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, cache=None, item_engine=None, own_nit=None,
+                 timeout=DEFAULT_TIMEOUT, max_memory_mb=DEFAULT_MAX_MEMORY_MB, on_wait=None):
+        # 0: extraer en este proceso, sin aislamiento ni límites
+        self.max_workers = max(0, max_workers)
+        self.cache = cache
+        self.item_engine = item_engine or default_item_engine()
+        # El texto del encabezado y los totales depende del backend (DIAN_TEXT_BACKEND)
+        self.text_backend = default_backend()
+        # NIT de la empresa del usuario para el modo automático (si no, se deduce del lote)
+        self.own_nit = normalize_nit(own_nit) if own_nit else None
+        self.resolved_nit = None
+        self.timeout = timeout
+        self.max_memory_mb = max_memory_mb
+        self.on_wait = on_wait
+        self.pool = None
+        self.digests = {}
+        self.cancelled = False
+
+    def cache_type(self, doc_type):
+        """Tipo de documento para la caché (cada motor de ítems y backend de texto
+        se guarda por separado)"""
+        return f"{doc_type}|{self.item_engine}|{self.text_backend}"
+
+    def file_digest(self, path):
+        """Hash del archivo (calculado una vez por corrida); None si no se puede leer"""
+        if path not in self.digests:
+            try:
+                self.digests[path] = file_hash(path)
+            except OSError:
+                self.digests[path] = None
+        return self.digests[path]
+
+    def cache_get(self, path, doc_type):
+        digest = self.file_digest(path) if self.cache is not None else None
+        return self.cache.get(digest, doc_type) if digest else None
+
+    def cache_put(self, path, doc_type, value):
+        digest = self.file_digest(path) if self.cache is not None else None
+        if digest:
+            self.cache.put(digest, doc_type, value)
+
+    def cancel(self):
+        """Detiene la extracción en curso (por ejemplo desde on_wait): los procesos
+        ocupados se matan y los archivos que faltan no se procesan"""
+        self.cancelled = True
+        if self.pool:
+            self.pool.cancel()
+
+    def start_pool(self):
+        if self.pool is None:
+            self.pool = IsolatedWorkerPool(self.max_workers, self.timeout, self.max_memory_mb,
+                                           self.on_wait)
+        return self.pool
+
+    def run_jobs(self, function, jobs):
+        """Genera (args, resultado, error) por cada tupla de argumentos de `jobs`.
+
+        Con max_workers=0 todo corre en este proceso, en orden. Si no, en el
+        pool de procesos aislados, en orden de terminación y con un trabajo por
+        proceso a la vez: cada resultado se entrega y se suelta antes de enviar
+        el siguiente trabajo.
+        """
+        if self.max_workers == 0:
+            for args in jobs:
+                if self.cancelled:
+                    return
+                try:
+                    yield args, function(*args), None
+                except Exception as e:
+                    yield args, None, e
+            return
+        if not self.cancelled:
+            yield from self.start_pool().run(function, jobs)
+
+    def classify(self, paths):
+        """Tipo de cada archivo según su primera página (None si no se reconoce).
+
+        Los datos de clasificación se guardan en la caché por archivo; las
+        facturas se separan en venta o compra según el NIT de la empresa.
+        """
+        paths = list(paths)
+        facts = {}
+        pending = []
+        for path in paths:
+            cached = self.cache_get(path, f"{CLASSIFICATION_TYPE}|{self.text_backend}")
+            if cached is None:
+                pending.append((path,))
+            else:
+                facts[path] = cached
+
+        for (path,), result, error in self.run_jobs(classify_document, pending):
+            facts[path] = result
+            if error is not None:
+                print(f"Error clasificando {os.path.basename(path)}: {str(error)}")
+                continue
+            self.cache_put(path, f"{CLASSIFICATION_TYPE}|{self.text_backend}", result)
+
+        if self.cancelled:
+            return {}
+        self.resolved_nit = self.own_nit or infer_own_nit(facts.values())
+        return {path: resolve_document_type(facts.get(path), self.resolved_nit) for path in paths}
+
+    def cached_results(self, jobs, misses):
+        """Genera los resultados ya guardados en la caché; los archivos que hay
+        que extraer se agregan a `misses` (solo la ruta y el tipo)"""
+        for path, doc_type in jobs:
+            if self.cancelled:
+                return
+            value = self.cache_get(path, self.cache_type(doc_type))
+            if value is None:
+                misses.append((path, doc_type, self.item_engine, self.text_backend))
+            else:
+                yield ExtractionResult.from_cache(path, doc_type, value)
+
+    def extract(self, paths, doc_type):
+        """Genera un ExtractionResult por archivo a medida que se completan.
+
+        Con AUTO_TYPE cada archivo se clasifica primero y va al procesador de su
+        tipo; todos los tipos se extraen en la misma pasada del pool. Los
+        resultados entregados no se guardan: la memoria no crece con el lote.
+        """
+        try:
+            if doc_type == AUTO_TYPE:
+                jobs = []
+                for path, detected in self.classify(paths).items():
+                    if detected in DOCUMENT_SPECS:
+                        jobs.append((path, detected))
+                    else:
+                        yield ExtractionResult(path, AUTO_TYPE,
+                                               error='No se pudo determinar el tipo de documento')
+            else:
+                jobs = ((path, doc_type) for path in paths)
+
+            misses = []
+            yield from self.cached_results(jobs, misses)
+            for (path, job_type, *_), result, error in self.run_jobs(extract_document, misses):
+                if error is not None:
+                    # Tiempo o memoria excedidos, proceso caído o resultado no transferible
+                    yield ExtractionResult(path, job_type, error=str(error))
+                    continue
+                if not result.error:
+                    self.cache_put(path, self.cache_type(result.doc_type), result.to_cache())
+                yield result
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """Cancela lo pendiente y libera los procesos"""
+        if self.pool:
+            self.pool.shutdown()
+            self.pool = None
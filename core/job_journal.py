@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+import time
+
+JOURNAL_FILENAME = "descargas_dian.sqlite"
+
+# Estados de un CUFE dentro del journal
+PENDING = "pending"
+TOKEN_CAPTURED = "token_captured"
+DOWNLOADED = "downloaded"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    cufe TEXT PRIMARY KEY,
+    excel_name TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    token TEXT,
+    download_url TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    token_seconds REAL,
+    download_seconds REAL,
+    created_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state);
+"""
+
+
+def pdf_filename(excel_name, cufe):
+    """Nombre con el que se guarda el PDF de un CUFE en la carpeta de descarga"""
+    return f"{excel_name}_{cufe}.pdf"
+
+
+class JobJournal:
+    """Registro persistente (SQLite) del estado de cada CUFE en una carpeta de descarga.
+
+    Reemplaza a urls.txt / links_descarga.txt: permite reanudar una descarga
+    interrumpida procesando solo los CUFEs que aún no se han descargado.
+    """
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.path = os.path.join(folder_path, JOURNAL_FILENAME)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def add_pending(self, cufes, excel_name=""):
+        """Registra los CUFEs que aún no existen en el journal"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO jobs (cufe, excel_name, state, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(cufe, excel_name, PENDING, now, now) for cufe in cufes]
+            )
+            self.conn.execute("COMMIT")
+
+    def remaining(self, cufes):
+        """CUFEs de la lista que no han sido descargados, en el mismo orden.
+        Un CUFE descargado cuyo PDF ya no está en la carpeta vuelve a pendiente."""
+        wanted = set(cufes)
+        rows = self.execute("SELECT cufe, state, excel_name FROM jobs")
+        not_done = set()
+        deleted = []
+        for cufe, state, excel_name in rows:
+            if cufe not in wanted:
+                continue
+            if state != DOWNLOADED:
+                not_done.add(cufe)
+            elif not os.path.exists(os.path.join(self.folder_path,
+                                                 pdf_filename(excel_name or "", cufe))):
+                deleted.append(cufe)
+        if deleted:
+            now = time.time()
+            with self.lock:
+                self.conn.executemany(
+                    "UPDATE jobs SET state = ?, download_url = NULL, updated_at = ? WHERE cufe = ?",
+                    [(PENDING, now, cufe) for cufe in deleted]
+                )
+            not_done.update(deleted)
+        return [cufe for cufe in cufes if cufe in not_done]
+
+    def start_attempt(self, cufe):
+        self.execute(
+            "UPDATE jobs SET attempts = attempts + 1, updated_at = ? WHERE cufe = ?",
+            (time.time(), cufe)
+        )
+
+    def mark_token(self, cufe, token, seconds=None):
+        self.execute(
+            "UPDATE jobs SET state = ?, token = ?, token_seconds = ?, error = NULL, "
+            "updated_at = ? WHERE cufe = ?",
+            (TOKEN_CAPTURED, token, seconds, time.time(), cufe)
+        )
+
+    def mark_downloaded(self, cufe, download_url, seconds=None):
+        self.execute(
+            "UPDATE jobs SET state = ?, download_url = ?, download_seconds = ?, error = NULL, "
+            "updated_at = ? WHERE cufe = ?",
+            (DOWNLOADED, download_url, seconds, time.time(), cufe)
+        )
+
+    def mark_failed(self, cufe, error):
+        self.execute(
+            "UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE cufe = ?",
+            (FAILED, error, time.time(), cufe)
+        )
+
+    def tokens(self):
+        """Tokens capturados por CUFE"""
+        return dict(self.execute("SELECT cufe, token FROM jobs WHERE token IS NOT NULL"))
+
+    def clear_token(self, cufe):
+        self.execute(
+            "UPDATE jobs SET token = NULL, updated_at = ? WHERE cufe = ?",
+            (time.time(), cufe)
+        )
+
+    def counts(self):
+        """Cantidad de CUFEs por estado"""
+        return dict(self.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
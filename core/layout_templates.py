@@ -0,0 +1,117 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+TEMPLATES_FILENAME = "plantillas_emisores.sqlite"
+
+# Diferencia máxima (puntos) entre una columna de la plantilla y la línea vertical del PDF
+COLUMN_TOLERANCE = 1.0
+# Columnas mínimas de la grilla de ítems (Nro. ... %IVA)
+MIN_GRID_COLUMNS = 10
+# Un emisor puede tener varias variantes (el ancho de columnas depende del contenido)
+MAX_TEMPLATES_PER_ISSUER = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS templates (
+    nit TEXT PRIMARY KEY,
+    templates TEXT NOT NULL,
+    created_at REAL,
+    updated_at REAL
+);
+"""
+
+
+def learn_template(tables):
+    """Plantilla a partir de las tablas detectadas en una página (None si no hay grilla)"""
+    grids = [table for table in tables if len(table.columns) >= MIN_GRID_COLUMNS]
+    if not grids:
+        return None
+    grid = max(grids, key=lambda table: len(table.rows))
+    columns = sorted({round(column.bbox[0], 2) for column in grid.columns}
+                     | {round(grid.columns[-1].bbox[2], 2)})
+    return {
+        "columns": columns,
+        "table_settings": {
+            "vertical_strategy": "explicit",
+            "explicit_vertical_lines": columns,
+            "horizontal_strategy": "lines"
+        }
+    }
+
+
+def vertical_edges(page):
+    return [edge["x0"] for edge in page.edges if edge["orientation"] == "v"]
+
+
+def template_matches(edges, template):
+    """True si todas las columnas de la plantilla coinciden con líneas verticales de la página"""
+    return all(any(abs(x - column) <= COLUMN_TOLERANCE for x in edges)
+               for column in template["columns"])
+
+
+class LayoutTemplateStore:
+    """Plantillas de la grilla de ítems por NIT del emisor, persistentes entre corridas.
+
+    El PDF de la DIAN de un mismo emisor tiene el mismo layout cada mes: en vez
+    de volver a deducir las columnas de las líneas de la tabla, se reutilizan
+    las fronteras aprendidas como líneas verticales explícitas.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            # Import local: extraction_cache depende de pdf_processor, que usa ParsedDocument
+            from .extraction_cache import CACHE_DIR
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, TEMPLATES_FILENAME)
+        self.path = path
+        self.lock = threading.Lock()
+        self.templates = {}
+        # Usos y rechazos de plantillas en este proceso (para diagnóstico)
+        self.hits = 0
+        self.failures = 0
+        # Varios procesos de extracción comparten el archivo
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def get(self, nit):
+        """Variantes conocidas del emisor, la más reciente primero"""
+        if nit not in self.templates:
+            rows = self.execute("SELECT templates FROM templates WHERE nit = ?", (nit,))
+            self.templates[nit] = json.loads(rows[0][0]) if rows else []
+        return self.templates[nit]
+
+    def put(self, nit, template):
+        """Agrega una variante aprendida (descarta la más antigua si hay demasiadas)"""
+        variants = [template] + [known for known in self.get(nit) if known != template]
+        variants = variants[:MAX_TEMPLATES_PER_ISSUER]
+        self.templates[nit] = variants
+        now = time.time()
+        self.execute(
+            "INSERT INTO templates (nit, templates, created_at, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(nit) DO UPDATE SET templates = excluded.templates, "
+            "updated_at = excluded.updated_at",
+            (nit, json.dumps(variants), now, now)
+        )
+
+    def record(self, success):
+        if success:
+            self.hits += 1
+        else:
+            self.failures += 1
+
+    def forget(self, nit):
+        self.templates.pop(nit, None)
+        self.execute("DELETE FROM templates WHERE nit = ?", (nit,))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
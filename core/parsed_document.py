@@ -0,0 +1,270 @@
+import re
+from contextlib import contextmanager
+
+import pdfplumber
+
+from .field_extractor import HEADER_EXTRACTOR
+from .layout_templates import MIN_GRID_COLUMNS, learn_template, template_matches, vertical_edges
+from .text_backend import open_text_backend
+from .ubl_document import UblDocument, is_xml_source
+from .word_grid import ITEM_ENGINE_WORDS, default_item_engine, extract_word_grid
+
+# Encabezado de la grilla de ítems (las filas de producto solo aparecen en páginas que lo tienen)
+GRID_HEADER = ("Nro.", "Descripción", "Cantidad")
+GRID_TITLE = "Detalles de Productos"
+# Secciones que empiezan debajo de la grilla
+GRID_END = ("Referencias", "Notas Finales", "Datos Totales")
+TOTALS_TITLE = "Datos Totales"
+NIT_EMISOR = re.compile(r"Nit del Emisor:\s*(\d+)")
+
+
+def close_page(page):
+    """Vacía los objetos y el layout en caché de una página de pdfplumber"""
+    # Page.close() (pdfplumber >= 0.11) también limpia el mapa de texto
+    getattr(page, "close", page.flush_cache)()
+
+
+class ParsedDocument:
+    """PDF abierto una sola vez con caché perezosa de texto y tablas de ítems por página.
+
+    Todos los extractores (process_*, extract_total_impuestos, process_inventory,
+    get_document_type) reciben el mismo objeto, de modo que cada página se
+    analiza como máximo una vez por corrida.
+
+    El texto (encabezado, "Datos Totales", tipo de documento) sale de un backend
+    rápido sin layout; pdfplumber solo se abre si se piden las tablas de ítems.
+    Con `templates` (LayoutTemplateStore) la grilla de ítems se extrae con las
+    columnas ya aprendidas para el emisor. `item_engine` elige entre la
+    detección de tablas de pdfplumber ("tablas") y la asignación de palabras a
+    la cuadrícula ("palabras").
+    """
+
+    def __init__(self, path, text_backend=None, templates=None, item_engine=None):
+        self.path = path
+        self.text = open_text_backend(path, text_backend)
+        self.templates = templates
+        self.item_engine = item_engine or default_item_engine()
+        self._pdf = None
+        self._text = {}
+        self._item_tables = {}
+        self._item_pages = None
+        self._totals_page = -1
+        self._header_fields = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.text)
+
+    @property
+    def pdf(self):
+        if self._pdf is None:
+            # El backend pdfplumber ya tiene el PDF abierto
+            self._pdf = self.text.pdf if self.text.layout else pdfplumber.open(self.path)
+        return self._pdf
+
+    @property
+    def pages(self):
+        return self.pdf.pages
+
+    @property
+    def stream_text(self):
+        """True si el texto sigue el orden del contenido y no el layout de la página"""
+        return not self.text.layout
+
+    def page_text(self, index):
+        if index not in self._text:
+            self._text[index] = self.text.page_text(index)
+        return self._text[index]
+
+    @property
+    def first_page_text(self):
+        return self.page_text(0)
+
+    @property
+    def header_fields(self):
+        """Campos del encabezado (HEADER_FIELDS), extraídos una vez por documento"""
+        if self._header_fields is None:
+            self._header_fields = HEADER_EXTRACTOR.extract(self.first_page_text)
+        return self._header_fields
+
+    def has_grid_header(self, index):
+        text = self.page_text(index)
+        return all(word in text for word in GRID_HEADER)
+
+    def item_pages(self):
+        """Páginas con la grilla de ítems: desde la que tiene el encabezado hasta la que
+        abre la sección siguiente (la grilla puede seguir en páginas sin encabezado).
+        Si ninguna página tiene el encabezado se revisan todas."""
+        if self._item_pages is None:
+            pages = []
+            in_grid = False
+            for index in range(len(self)):
+                if self.has_grid_header(index):
+                    in_grid = True
+                if in_grid:
+                    pages.append(index)
+                    text = self.page_text(index)
+                    if any(marker in text for marker in GRID_END):
+                        in_grid = False
+            self._item_pages = pages or list(range(len(self)))
+        return self._item_pages
+
+    def totals_page(self):
+        """Índice de la página con "Datos Totales" o None"""
+        if self._totals_page == -1:
+            self._totals_page = next((index for index in range(len(self))
+                                      if TOTALS_TITLE in self.page_text(index)), None)
+        return self._totals_page
+
+    def item_region(self, index):
+        """Recuadro (x0, top, x1, bottom) de la grilla en la página, o None si no se puede ubicar"""
+        header_tops = self.text.text_tops(index, GRID_HEADER[0])
+        if header_tops is None:
+            return None
+        # En páginas de continuación la grilla empieza arriba
+        header_top = min(header_tops, default=0)
+
+        page = self.pdf.pages[index]
+        x0, page_top, x1, page_bottom = page.bbox
+        if page_top != 0:
+            return None
+
+        # Desde el título de la sección (o el borde de la página si la grilla continúa)
+        top = max([t for t in self.text.text_tops(index, GRID_TITLE) if t < header_top], default=0)
+        # Hasta la siguiente sección (o el final de la página)
+        bottom = min([t for marker in GRID_END for t in self.text.text_tops(index, marker)
+                      if t > header_top], default=page_bottom)
+        return (x0, max(top, 0), x1, min(bottom, page_bottom))
+
+    def page_item_tables(self, index):
+        """Tablas dentro del recuadro de la grilla de ítems"""
+        if index not in self._item_tables:
+            page = self.pdf.pages[index]
+            region = self.item_region(index)
+            grid = page.crop(region) if region else page
+            self._item_tables[index] = self.detect_item_tables(index, grid)
+            if grid is not page:
+                # El recorte queda en un ciclo de referencias (la caché de get_textmap
+                # apunta a él): sin vaciarlo, sus objetos esperan al recolector de ciclos
+                close_page(grid)
+            self.release_page(index)
+        return self._item_tables[index]
+
+    def release_page(self, index):
+        """Descarta los objetos y el layout que pdfplumber guarda de la página.
+
+        pdf.pages conserva cada página abierta: sin esto una factura larga
+        mantiene en memoria todos sus caracteres y líneas hasta cerrarse.
+        """
+        page = self.pdf.pages[index]
+        close_page(page)
+        self.release_contents(page.page_obj)
+
+    def release_contents(self, page_obj):
+        """pdfminer deja descomprimido el contenido de la página en PDFPage.contents
+        (y en la caché de objetos del documento). Se reemplaza por el flujo sin
+        decodificar, releído del archivo, por si la página se vuelve a analizar.
+        La caché es interna de pdfminer: si la versión instalada no la tiene, la
+        página se deja como está."""
+        document = self.pdf.doc
+        cached_objs = getattr(document, "_cached_objs", None)
+        if not isinstance(cached_objs, dict):
+            return
+        contents = []
+        for stream in page_obj.contents:
+            if getattr(stream, "data", None) is not None and stream.objid is not None:
+                cached_objs.pop(stream.objid, None)
+                stream = document.getobj(stream.objid)
+            contents.append(stream)
+        page_obj.contents = contents
+
+    @property
+    def issuer_nit(self):
+        match = NIT_EMISOR.search(self.first_page_text)
+        return match.group(1) if match else None
+
+    def detect_item_tables(self, index, page):
+        """Tablas con una plantilla del emisor si alguna sigue siendo válida; si no,
+        detección completa (y se aprende la variante nueva)"""
+        nit = self.issuer_nit if self.templates is not None else None
+        # Sin líneas verticales no hay grilla en el recuadro
+        edges = vertical_edges(page) if nit else []
+
+        if self.item_engine == ITEM_ENGINE_WORDS:
+            if edges:
+                # Las columnas de la plantilla reemplazan las de las líneas verticales
+                tables = self.template_tables(
+                    index, nit, edges,
+                    lambda template: extract_word_grid(page, columns=template["columns"]))
+                if tables is not None:
+                    return tables
+            tables = extract_word_grid(page)
+            if tables is not None:
+                return tables
+
+        if not edges:
+            return page.extract_tables()
+
+        tables = self.template_tables(
+            index, nit, edges, lambda template: page.extract_tables(template["table_settings"]))
+        if tables is not None:
+            return tables
+
+        found = page.find_tables()
+        learned = learn_template(found)
+        if learned:
+            self.templates.put(nit, learned)
+        return [table.extract() for table in found]
+
+    def template_tables(self, index, nit, edges, extract):
+        """Tablas que da `extract` con la primera plantilla del emisor que coincide con
+        las líneas de la página y produce una grilla válida; None si ninguna sirve"""
+        for template in self.templates.get(nit):
+            if template_matches(edges, template):
+                tables = extract(template)
+                if tables is not None and self.valid_grid(index, tables, template):
+                    self.templates.record(True)
+                    return tables
+        self.templates.record(False)
+        return None
+
+    def valid_grid(self, index, tables, template):
+        """Las filas de ítems deben tener tantas celdas como columnas tiene la plantilla"""
+        width = len(template["columns"]) - 1
+        rows = [row for table in tables for row in table
+                if row and len(row) >= MIN_GRID_COLUMNS
+                and str(row[0] if row[0] is not None else '').strip().isdigit()]
+        if any(len(row) != width for row in rows):
+            return False
+        # En la página del encabezado siempre hay al menos un ítem
+        return bool(rows) or not self.has_grid_header(index)
+
+    def item_tables(self):
+        """Tablas de la grilla de ítems; las páginas de totales, firmas y QR no se analizan"""
+        for index in self.item_pages():
+            yield from self.page_item_tables(index)
+
+    def close(self):
+        if self._pdf is not None and not self.text.layout:
+            self._pdf.close()
+        self._pdf = None
+        self.text.close()
+
+
+@contextmanager
+def open_document(source):
+    """Acepta una ruta (PDF, o XML/.zip UBL) o un documento ya abierto; solo cierra lo que abre"""
+    if isinstance(source, (ParsedDocument, UblDocument)):
+        yield source
+        return
+
+    document = UblDocument(source) if is_xml_source(source) else ParsedDocument(source)
+    try:
+        yield document
+    finally:
+        document.close()
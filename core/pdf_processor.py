@@ -1,12 +1,15 @@
 # Importaciones estándar
 import os
-import re
+import numpy as np
 import pandas as pd
-from collections import defaultdict
+from collections import Counter
+from decimal import Decimal
 
 # Importaciones para PDF
-import pdfplumber
-from PyPDF2 import PdfReader
+from .field_extractor import HEADER_FIELDS, TOTALS_EXTRACTOR
+from .parsed_document import open_document
+from .ubl_document import UblDocument
+from .worker_pool import DEFAULT_MAX_MEMORY_MB, DEFAULT_TIMEOUT
 
 # Importaciones PyQt5
 from PyQt5.QtWidgets import (
@@ -29,6 +32,16 @@ from PyQt5.QtCore import Qt
 
 
 
+# Columnas de la grilla de ítems del PDF de la DIAN (claves del inventario)
+ITEM_COLUMNS = [
+    "Nro", "Codigo", "Descripcion", "U/M", "Cantidad", "Precio_unitario", "Descuento",
+    "Recargo", "IVA", "Porcentaje_IVA", "INC", "Porcentaje_INC", "Precio_venta"
+]
+# Columnas con montos en formato colombiano
+AMOUNT_COLUMNS = (4, 5, 6, 7, 8, 10, 12)
+# Dígitos enteros que caben en centavos int64 sin perder exactitud en float64
+MAX_INTEGER_DIGITS = 13
+
 # Constantes y configuración global
 COLUMN_HEADERS = {
    "A": "Razón Social",
@@ -57,6 +70,21 @@ COLUMN_HEADERS = {
     "X": "Rete ICA"
 }
 
+# Título de cada tipo de documento (en minúsculas), en orden: las notas también
+# mencionan la factura electrónica y cualquier otra factura electrónica (de
+# venta, de mandato, de exportación...) es una factura de venta del emisor
+DOCUMENT_TITLES = [
+    ("nota crédito", 'Nota Crédito'),
+    ("nota débito", 'Nota Débito'),
+    ("factura de compra electrónica", 'Factura de Compra'),
+    ("factura de gastos", 'Facturas de Gastos'),
+    ("compras nuevos", 'Facturas de Compras Nuevos'),
+    ("factura electrónica", 'Factura de Venta')
+]
+
+# Incrementar al cambiar la lógica de extracción: invalida la caché de resultados
+EXTRACTOR_VERSION = "2"
+
 
 def get_invoice_type(filename, pdf_path, user_selected_type, prefijo_venta):
     """Determina el tipo de factura basado en la selección del usuario"""
@@ -73,29 +101,65 @@ def get_invoice_type(filename, pdf_path, user_selected_type, prefijo_venta):
     # Retornar el tipo de documento seleccionado por el usuario
     return type_mapping.get(user_selected_type)
 
-def get_document_type(filepath):
+def document_facts(document):
+    """Lo que se necesita para clasificar un documento, leído solo de la primera
+    página (o del elemento raíz si es XML UBL).
+
+    Retorna el tipo según el título (None si no se reconoce) y los NIT del
+    emisor y del comprador, que deciden si una factura es de venta o de compra.
+    """
+    with open_document(document) as document:
+        campos = document.header_fields
+        if isinstance(document, UblDocument):
+            # En el XML el tipo lo dice el elemento raíz
+            title_type = document.doc_type
+        else:
+            text = document.first_page_text.casefold()
+            title_type = next((doc_type for marker, doc_type in DOCUMENT_TITLES if marker in text), None)
+        return {
+            "tipo": title_type,
+            "nit_emisor": normalize_nit(campos["nit_emisor"]),
+            "nit_comprador": normalize_nit(campos["documento_comprador"])
+        }
+
+
+def normalize_nit(value):
+    """Solo los dígitos del NIT (sin puntos, guiones ni dígito de verificación separado)"""
+    return "".join(char for char in value.split("-")[0] if char.isdigit())
+
+
+def infer_own_nit(facts_list):
+    """NIT de la empresa del usuario: el que aparece como emisor o comprador en más
+    documentos del lote. None si no hay uno claramente mayoritario."""
+    counts = Counter()
+    for facts in facts_list:
+        if facts:
+            counts.update({nit for nit in (facts["nit_emisor"], facts["nit_comprador"]) if nit})
+    ranked = counts.most_common(2)
+    if not ranked or (len(ranked) > 1 and ranked[0][1] == ranked[1][1]):
+        return None
+    return ranked[0][0]
+
+
+def resolve_document_type(facts, own_nit=None):
+    """Tipo de documento a partir de document_facts().
+
+    Toda factura electrónica dice "de venta" desde el lado del emisor: si la
+    empresa del usuario es la compradora, para ella es una factura de compra.
+    """
+    if not facts:
+        return None
+    doc_type = facts["tipo"]
+    if doc_type == 'Factura de Venta' and own_nit and facts["nit_comprador"] == own_nit \
+            and facts["nit_emisor"] != own_nit:
+        return 'Factura de Compra'
+    return doc_type
+
+
+def get_document_type(filepath, own_nit=None):
     """Determina el tipo de documento basado en el contenido del archivo"""
     try:
-        with pdfplumber.open(filepath) as pdf:
-            text = pdf.pages[0].extract_text()
-            
-            # Verificar el tipo de documento basado en el texto
-            if "Factura Electrónica de Venta" in text:
-                return "Factura de Venta"
-            elif "Nota Crédito de la Factura Electrónica" in text:
-                return "Nota Crédito"
-            elif "Nota Débito de la Factura Electrónica" in text:
-                return "Nota Débito"
-            elif "Factura de Compra Electrónica" in text:
-                return "Factura de Compra"
-            elif "Factura de Gastos" in text:
-                return "Facturas de Gastos"
-            elif "Compras Nuevos" in text:
-                return "Facturas de Compras Nuevos"
-            
-            # Si no se puede determinar, retornar None
-            return None
-            
+        return resolve_document_type(document_facts(filepath), own_nit)
     except Exception as e:
         print(f"Error determinando tipo de documento: {str(e)}")
         return None
@@ -156,7 +220,138 @@ def parse_colombian_number(text):
     except (ValueError, AttributeError):
         print(f"No se pudo convertir el valor: '{text}'")
         return 0.0
-        
+
+
+def replace_text(strings, old, new):
+    """np.strings.replace sobre un arreglo de textos (falla con arreglos vacíos)"""
+    return np.strings.replace(strings, old, new) if len(strings) else strings
+
+
+def to_floats(strings):
+    """float() sobre un arreglo de textos; retorna (valores, invalidos) con 0 en los inválidos"""
+    try:
+        return strings.astype(np.float64), np.zeros(len(strings), dtype=bool)
+    except ValueError:
+        # Alguna celda no es un número: se convierten una por una solo en este caso
+        values = np.zeros(len(strings), dtype=np.float64)
+        invalid = np.zeros(len(strings), dtype=bool)
+        for index, text in enumerate(strings.tolist()):
+            try:
+                values[index] = float(text)
+            except ValueError:
+                invalid[index] = True
+        return values, invalid
+
+
+def parse_colombian_numbers(values, exact=False):
+    """Versión por columnas de parse_colombian_number ("$ 1.234.567,89" -> 1234567.89).
+
+    Los montos con el formato normal (dígitos, puntos de miles y hasta dos
+    decimales tras la coma) se convierten a centavos con aritmética de NumPy
+    sobre los códigos de los caracteres; el resto (signos, exponentes, varias
+    comas) sigue la regla de parse_colombian_number celda por celda.
+
+    Retorna (valores, invalidos): un arreglo float64 (o de Decimal con
+    exact=True) y la máscara de las celdas que no se pudieron convertir, que
+    quedan en 0 sin imprimir nada. Las celdas vacías valen 0 y no son inválidas.
+    """
+    text = np.array(['' if value is None else str(value) for value in values], dtype=str)
+
+    # Una fila por celda, una columna por carácter; "$", espacios y relleno no cuentan
+    codes = text.view(np.uint32).reshape(len(text), text.dtype.itemsize // 4)
+    ignored = (codes == 0) | (codes == ord('$')) | (codes == ord(' '))
+    digits = (codes >= ord('0')) & (codes <= ord('9'))
+    commas = codes == ord(',')
+    dots = codes == ord('.')
+    after_comma = np.cumsum(commas, axis=1) > 0
+    integer_digits = digits & ~after_comma
+    decimal_digits = digits & after_comma
+    integer_count = integer_digits.sum(axis=1)
+    decimal_count = decimal_digits.sum(axis=1)
+
+    empty = ignored.all(axis=1) | (np.strings.strip(text) == '')
+    regular = (~empty & (ignored | digits | commas | dots).all(axis=1)
+               & (commas.sum(axis=1) <= 1) & ~(dots & after_comma).any(axis=1)
+               & (decimal_count <= 2) & (integer_count + decimal_count > 0)
+               & (integer_count <= MAX_INTEGER_DIGITS))
+
+    # Horner por columnas: parte entera y decimales como enteros
+    integer = np.zeros(len(text), dtype=np.int64)
+    decimal = np.zeros(len(text), dtype=np.int64)
+    for column in range(codes.shape[1]):
+        value = codes[:, column].astype(np.int64) - ord('0')
+        integer = np.where(integer_digits[:, column], integer * 10 + value, integer)
+        decimal = np.where(decimal_digits[:, column], decimal * 10 + value, decimal)
+    cents = integer * 100 + np.where(decimal_count == 1, decimal * 10, decimal)
+
+    # División exacta de enteros: mismo float que float("1234.56")
+    parsed = np.where(regular, cents / 100, 0.0)
+    invalid = np.zeros(len(text), dtype=bool)
+    numbers = {}
+    for index in np.flatnonzero(~regular & ~empty):
+        number = text[index].replace('$', '').replace(' ', '')
+        parts = number.split(',')
+        if len(parts) > 1:
+            number = f"{parts[0].replace('.', '')}.{parts[1][:2]}"
+        else:
+            number = number.replace('.', '')
+        try:
+            parsed[index] = float(number)
+            numbers[index] = number
+        except ValueError:
+            invalid[index] = True
+
+    if exact:
+        exact_values = np.empty(len(text), dtype=object)
+        for index in range(len(text)):
+            if regular[index]:
+                exact_values[index] = Decimal(int(cents[index])).scaleb(-2)
+            else:
+                exact_values[index] = Decimal(numbers[index]) if index in numbers else Decimal(0)
+        parsed = exact_values
+    return parsed, invalid
+
+
+def item_cells(document, min_cells=10):
+    """Celdas (sin espacios) de las filas de la grilla con al menos `min_cells` celdas.
+
+    Retorna (celdas, anchos): un arreglo de textos con una fila por fila del
+    PDF y al menos las 13 columnas de ITEM_COLUMNS (vacías si la fila es más
+    corta), y la cantidad de celdas original de cada fila.
+    """
+    rows = []
+    for table in document.item_tables():
+        for row in table:
+            if not row or len(row) < min_cells:
+                continue
+            rows.append([str(cell).strip() if cell is not None else '' for cell in row])
+    width = max([len(ITEM_COLUMNS)] + [len(row) for row in rows])
+    cells = np.array([row + [''] * (width - len(row)) for row in rows], dtype=str)
+    return cells.reshape(len(rows), width), np.array([len(row) for row in rows], dtype=int)
+
+
+def item_amounts(cells, price=5, rate=9, discount=6):
+    """Precio unitario, %IVA y descuento de las filas de ítem (primera celda numérica).
+
+    Las filas cuyo %IVA no es un número se descartan, como en los ciclos por fila.
+    """
+    items = cells[np.strings.isdigit(cells[:, 0])]
+    precio, _ = parse_colombian_numbers(items[:, price])
+    descuento, _ = parse_colombian_numbers(items[:, discount])
+    iva, invalid = to_floats(replace_text(items[:, rate], ',', '.'))
+    if invalid.any():
+        print(f"Filas con %IVA inválido descartadas: {int(invalid.sum())}")
+    valid = ~invalid
+    return precio[valid], iva[valid], descuento[valid]
+
+
+def sum_by_iva(iva, precio):
+    """Suma del precio unitario por %IVA, en el orden en que aparece cada tarifa"""
+    rates, first, groups = np.unique(iva, return_index=True, return_inverse=True)
+    # bincount suma en el orden de las filas: mismo resultado que acumular fila a fila
+    sums = np.bincount(groups.ravel(), weights=precio, minlength=len(rates))
+    return {float(rates[group]): float(sums[group]) for group in np.argsort(first)}
+
 
 def extract_field(text, start_marker, end_marker):
     """Extrae un campo específico del texto entre dos marcadores"""
@@ -174,8 +369,11 @@ def extract_field(text, start_marker, end_marker):
     except Exception:
         return ""
 
-def extract_total_impuestos(pdf):
-    """Extrae los impuestos totales del documento"""
+def extract_total_impuestos(document):
+    """Extrae los impuestos totales del documento (ParsedDocument o UblDocument)"""
+    if isinstance(document, UblDocument):
+        return document.tax_totals()
+
     impuestos = {
         'Total IVA': 0.00,
         'Total INC': 0.00,
@@ -190,36 +388,23 @@ def extract_total_impuestos(pdf):
     
     try:
         datos_totales_text = ""
-        for page in pdf.pages:
-            text = page.extract_text()
-            if "Datos Totales" in text:
-                datos_totales_text = text[text.find("Datos Totales"):]
-                break
+        index = document.totals_page()
+        if index is not None:
+            text = document.page_text(index)
+            datos_totales_text = text[text.find("Datos Totales"):]
+            if document.stream_text:
+                # Sin layout las dos columnas del bloque salen por separado;
+                # los valores están en la última (la que empieza en "MONEDA COP")
+                valores = datos_totales_text.rfind("MONEDA")
+                if valores != -1:
+                    datos_totales_text = "Datos Totales\n" + datos_totales_text[valores:]
         
         if datos_totales_text:
-            patrones = {
-                'Total IVA': [r'IVA\s*[\$\s]*([0-9.,]+)'],
-                'Total INC': [r'INC\s*[\$\s]*([0-9.,]+)'],
-                'Total Bolsas': [r'Bolsas\s*[\$\s]*([0-9.,]+)'],
-                'IBUA': [r'IBUA\s*[\$\s]*([0-9.,]+)'],
-                'ICUI': [r'ICUI\s*[\$\s]*([0-9.,]+)'],  # Patrón específico para ICUI
-                'Otros Impuestos': [r'Otros impuestos\s*[\$\s]*([0-9.,]+)'],
-                'Rete Fuente': [r'Rete fuente\s*[\$\s]*([0-9.,]+)'],
-                'Rete IVA': [r'Rete IVA\s*[\$\s]*([0-9.,]+)'],
-                'Rete ICA': [r'Rete ICA\s*[\$\s]*([0-9.,]+)']
-            }
-            
-            for impuesto, lista_patrones in patrones.items():
-                for patron in lista_patrones:
-                    match = re.search(patron, datos_totales_text, re.IGNORECASE)  # Agregado IGNORECASE
-                    if match:
-                        valor_str = match.group(1).strip()
-                        try:
-                            valor = parse_colombian_number(valor_str)
-                            impuestos[impuesto] = valor
-                            break
-                        except Exception as e:
-                            print(f"Error convirtiendo valor para {impuesto}: {valor_str} - {str(e)}")
+            for impuesto, valor_str in TOTALS_EXTRACTOR.extract(datos_totales_text).items():
+                try:
+                    impuestos[impuesto] = parse_colombian_number(valor_str.strip())
+                except Exception as e:
+                    print(f"Error convirtiendo valor para {impuesto}: {valor_str} - {str(e)}")
                             
             # Debug: imprimir el texto encontrado
             print("Datos Totales encontrados:", datos_totales_text)
@@ -262,285 +447,206 @@ def create_base_row(emisor, tipo_documento, numero_documento, fecha_emision, num
 
 
     
+# Campos del encabezado que llenan cada fila (argumentos de create_base_row)
+ROW_HEADER_FIELDS = {
+    "emisor": "razon_social",
+    "numero_documento": "nit_emisor",
+    "fecha_emision": "fecha_emision",
+    "numero_factura": "numero_factura"
+}
+# Fila sin número de ítem con el IVA que asume el emisor: se registra como descuento
+IVA_ASUMIDO = "IVA ASUMIDO"
+CUENTA_DESCUENTOS = "42104001"
+
+
+class DocumentSpec:
+    """Cómo se extrae un tipo de documento.
+
+    En qué tabla de resultados van sus filas (`key`), de qué campos del
+    encabezado salen, qué columnas de la grilla son el precio, el %IVA y el
+    descuento, y si el tipo lleva fila de descuentos e inventario. Los nombres se validan al crear la especificación; run_spec
+    la ejecuta sobre un documento.
+    """
+
+    def __init__(self, doc_type, key, header=None, price="Precio_unitario", rate="Porcentaje_IVA",
+                 discount="Descuento", discounts=False, inventory=False):
+        self.doc_type = doc_type
+        self.key = key
+        self.header = dict(ROW_HEADER_FIELDS, **(header or {}))
+        unknown = [field for field in self.header.values() if field not in HEADER_FIELDS]
+        if unknown:
+            raise ValueError(f"Campos de encabezado desconocidos en {doc_type}: {unknown}")
+        unknown = [name for name in (price, rate, discount) if name not in ITEM_COLUMNS]
+        if unknown:
+            raise ValueError(f"Columnas de ítems desconocidas en {doc_type}: {unknown}")
+        self.columns = tuple(ITEM_COLUMNS.index(name) for name in (price, rate, discount))
+        self.discounts = discounts
+        self.inventory = inventory
+
+
+# Especificación de cada tipo de documento. Las notas tienen el mismo formato
+# que las facturas; en las de compra la razón social es la del comprador.
+DOCUMENT_SPECS = {spec.doc_type: spec for spec in [
+    DocumentSpec('Factura de Venta', 'venta'),
+    DocumentSpec('Factura de Compra', 'compra', header={"emisor": "nombre_comprador"},
+                 discounts=True, inventory=True),
+    DocumentSpec('Nota Crédito', 'credito'),
+    DocumentSpec('Nota Débito', 'debito'),
+    DocumentSpec('Facturas de Compras Nuevos', 'compras_nuevos',
+                 header={"emisor": "nombre_comprador"}, discounts=True, inventory=True),
+    DocumentSpec('Facturas de Gastos', 'gastos', header={"emisor": "nombre_comprador"})
+]}
+
+
+def discount_value(cells, descuentos, price_column):
+    """Valor de la fila de descuentos, o None si el documento no tiene descuentos.
+
+    Es la suma de los descuentos de detalle; si no hay, el IVA asumido por el
+    emisor (vale la última fila que lo menciona).
+    """
+    suma_descuentos_detalle = sum(descuentos[descuentos > 0].tolist())
+    tiene_descuento = bool((descuentos > 0).any())
+
+    asumido = cells[~np.strings.isdigit(cells[:, 0])
+                    & (np.strings.find(cells[:, 3], IVA_ASUMIDO) >= 0)]
+    iva_asumido = 0
+    if len(asumido):
+        iva_asumido = float(parse_colombian_numbers(asumido[:, price_column])[0][-1])
+        tiene_descuento = True
+
+    if not tiene_descuento:
+        return None
+    return suma_descuentos_detalle if suma_descuentos_detalle > 0 else iva_asumido
+
+
+def inventory_rows(cells, widths, campos):
+    """Una fila de inventario por ítem con todas las columnas de ITEM_COLUMNS"""
+    items = cells[np.strings.isdigit(cells[:, 0]) & (widths >= len(ITEM_COLUMNS))]
+
+    columns = {}
+    invalid = np.zeros(len(items), dtype=bool)
+    for position, column in enumerate(ITEM_COLUMNS):
+        if column in ("Porcentaje_IVA", "Porcentaje_INC"):
+            percent = np.strings.strip(replace_text(items[:, position], '%', ''))
+            values, bad = to_floats(np.where(percent == '', '0', percent))
+            invalid |= bad
+            columns[column] = values.tolist()
+        elif position in AMOUNT_COLUMNS:
+            columns[column] = parse_colombian_numbers(items[:, position])[0].tolist()
+        else:
+            columns[column] = items[:, position].tolist()
+
+    if invalid.any():
+        print(f"Líneas de inventario descartadas (porcentaje inválido): {int(invalid.sum())}")
+    inventory_items = []
+    for index in np.flatnonzero(~invalid):
+        item = {"nit_emisor": campos["nit_emisor"], "numero_factura": campos["numero_factura"]}
+        item.update((column, columns[column][index]) for column in ITEM_COLUMNS)
+        inventory_items.append(item)
+    return inventory_items
+
+
+def run_spec(spec, document):
+    """Extrae un documento (ParsedDocument) según su DocumentSpec.
+
+    La grilla de ítems se lee una sola vez para las filas por %IVA, los
+    descuentos y el inventario. Retorna (filas, descuentos, inventario); las
+    dos últimas quedan vacías si el tipo no las lleva.
+    """
+    campos = document.header_fields
+    header = {name: campos[field] for name, field in spec.header.items()}
+    impuestos = extract_total_impuestos(document)
+
+    cells, widths = item_cells(document)
+    price, rate, discount = spec.columns
+    precio, iva, descuentos = item_amounts(cells, price, rate, discount)
+
+    rows = [create_base_row(tipo_documento=spec.doc_type, iva_percent=iva_percent,
+                            base_iva=base_iva, impuestos=impuestos, **header)
+            for iva_percent, base_iva in sum_by_iva(iva, precio).items()]
+
+    descuento_rows = []
+    if spec.discounts:
+        valor_descuento = discount_value(cells, descuentos, price)
+        if valor_descuento is not None:
+            descuento_row = create_base_row(tipo_documento=spec.doc_type, iva_percent=0,
+                                            base_iva=valor_descuento, impuestos=impuestos, **header)
+            descuento_row.update({
+                "F": CUENTA_DESCUENTOS,
+                "G": str(valor_descuento),
+                "H": "0"
+            })
+            descuento_rows.append(descuento_row)
+
+    inventory = inventory_rows(cells, widths, campos) if spec.inventory else []
+    return rows, descuento_rows, inventory
+
+
+def process_document(doc_type, pdf_path):
+    """Filas de un documento del tipo indicado; (filas, descuentos) si el tipo
+    lleva descuentos. Acepta una ruta o un ParsedDocument."""
+    spec = DOCUMENT_SPECS[doc_type]
+    try:
+        with open_document(pdf_path) as document:
+            rows, descuentos, _ = run_spec(spec, document)
+    except Exception as e:
+        print(f"Error procesando {doc_type}: {str(e)}")
+        return (None, []) if spec.discounts else None
+    return (rows, descuentos) if spec.discounts else rows
+
+
 # Funciones de procesamiento principales
 def process_factura_venta(pdf_path):
     """Procesa una factura de venta"""
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            first_page = pdf.pages[0]
-            text = first_page.extract_text()
-            
-            emisor = extract_field(text, "Razón Social:", "Nombre Comercial:")
-            numero_documento = extract_field(text, "Nit del Emisor:", "País:")
-            fecha_emision = extract_field(text, "Fecha de Emisión:", "Medio de Pago:")
-            numero_factura = extract_field(text, "Número de Factura:", "Forma de pago:")
-            
-            impuestos = extract_total_impuestos(pdf)
-            
-            sumas_por_iva = defaultdict(float)
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                for table in tables:
-                    for row in table:
-                        if not row or len(row) < 10:
-                            continue
-                        row = [str(cell).strip() if cell is not None else '' for cell in row]
-                        if row[0].strip().isdigit():
-                            try:
-                                precio_unitario = parse_colombian_number(row[5])
-                                iva_percent = float(row[9].replace(',', '.'))
-                                sumas_por_iva[iva_percent] += precio_unitario
-                            except Exception as e:
-                                print(f"Error procesando fila: {str(e)}")
-                                continue
-            
-            rows = []
-            for iva_percent, base_iva in sumas_por_iva.items():
-                row = create_base_row(
-                    emisor=emisor,
-                    tipo_documento="Factura de Venta",
-                    numero_documento=numero_documento,
-                    fecha_emision=fecha_emision,
-                    numero_factura=numero_factura,
-                    iva_percent=iva_percent,
-                    base_iva=base_iva,
-                    impuestos=impuestos
-                )
-                rows.append(row)
-            
-            return rows
-            
-    except Exception as e:
-        print(f"Error procesando factura de venta: {str(e)}")
-        return None
+    return process_document('Factura de Venta', pdf_path)
 
 def process_factura_compra(pdf_path):
-    """Procesa una factura de compra"""
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            first_page = pdf.pages[0]
-            text = first_page.extract_text()
-            
-            nombre_comprador = extract_field(text, "Nombre o Razón Social:", "Tipo de Documento:")
-            numero_documento = extract_field(text, "Nit del Emisor:", "País:")
-            fecha_emision = extract_field(text, "Fecha de Emisión:", "Medio de Pago:")
-            numero_factura = extract_field(text, "Número de Factura:", "Forma de pago:")
-            
-            impuestos = extract_total_impuestos(pdf)
-            
-            sumas_por_iva = defaultdict(float)
-            suma_descuentos_detalle = 0
-            iva_asumido = 0
-            tiene_descuento = False
-            
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                for table in tables:
-                    for row in table:
-                        if not row or len(row) < 10:
-                            continue
-                        row = [str(cell).strip() if cell is not None else '' for cell in row]
-                        if row[0].strip().isdigit():
-                            try:
-                                precio_unitario = parse_colombian_number(row[5])
-                                iva_percent = float(row[9].replace(',', '.'))
-                                descuento = parse_colombian_number(row[6]) if row[6] else 0
-                                
-                                sumas_por_iva[iva_percent] += precio_unitario
-                                if descuento > 0:
-                                    suma_descuentos_detalle += descuento
-                                    tiene_descuento = True
-                                    
-                            except Exception as e:
-                                print(f"Error procesando fila: {str(e)}")
-                                continue
-                        elif len(row) >= 4 and "IVA ASUMIDO" in str(row[3]):
-                            try:
-                                iva_asumido = parse_colombian_number(row[5])
-                                tiene_descuento = True
-                            except Exception as e:
-                                print(f"Error procesando IVA ASUMIDO: {str(e)}")
-            
-            rows = []
-            for iva_percent, base_iva in sumas_por_iva.items():
-                row = create_base_row(
-                    emisor=nombre_comprador,
-                    tipo_documento="Factura de Compra",
-                    numero_documento=numero_documento,
-                    fecha_emision=fecha_emision,
-                    numero_factura=numero_factura,
-                    iva_percent=iva_percent,
-                    base_iva=base_iva,
-                    impuestos=impuestos
-                )
-                rows.append(row)
-            
-            # Procesar descuentos si existen
-            descuento_rows = []
-            if tiene_descuento:
-                valor_descuento = suma_descuentos_detalle if suma_descuentos_detalle > 0 else iva_asumido
-                descuento_row = create_base_row(
-                    emisor=nombre_comprador,
-                    tipo_documento="Factura de Compra",
-                    numero_documento=numero_documento,
-                    fecha_emision=fecha_emision,
-                    numero_factura=numero_factura,
-                    iva_percent=0,
-                    base_iva=valor_descuento,
-                    impuestos=impuestos
-                )
-                descuento_row.update({
-                    "F": "42104001",
-                    "G": str(valor_descuento),
-                    "H": "0"
-                })
-                descuento_rows.append(descuento_row)
-            
-            return rows, descuento_rows
-            
-    except Exception as e:
-        print(f"Error procesando factura de compra: {str(e)}")
-        return None, []
+    """Procesa una factura de compra; retorna (filas, descuentos)"""
+    return process_document('Factura de Compra', pdf_path)
 
-# Funciones similares para los otros tipos de documentos
 def process_nota_credito(pdf_path):
     """Procesa una nota crédito"""
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            # Lógica similar a process_factura_venta pero con tipo_documento="Nota Crédito"
-            # ...
-            pass
-    except Exception as e:
-        print(f"Error procesando nota crédito: {str(e)}")
-        return None
+    return process_document('Nota Crédito', pdf_path)
 
 def process_nota_debito(pdf_path):
     """Procesa una nota débito"""
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            # Lógica similar a process_factura_venta pero con tipo_documento="Nota Débito"
-            # ...
-            pass
-    except Exception as e:
-        print(f"Error procesando nota débito: {str(e)}")
-        return None
+    return process_document('Nota Débito', pdf_path)
 
 def process_facturas_compras_nuevos(pdf_path):
-    """Procesa una factura de compras nuevos"""
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            # Lógica similar a process_factura_compra
-            # ...
-            pass
-    except Exception as e:
-        print(f"Error procesando facturas de compras nuevos: {str(e)}")
-        return None
-
+    """Procesa una factura de compras nuevos; retorna (filas, descuentos)"""
+    return process_document('Facturas de Compras Nuevos', pdf_path)
 
 def process_facturas_gastos(pdf_path):
     """Procesa una factura de gastos"""
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            first_page = pdf.pages[0]
-            text = first_page.extract_text()
-            
-            nombre_comprador = extract_field(text, "Nombre o Razón Social:", "Tipo de Documento:")
-            numero_documento = extract_field(text, "Nit del Emisor:", "País:")
-            fecha_emision = extract_field(text, "Fecha de Emisión:", "Medio de Pago:")
-            numero_factura = extract_field(text, "Número de Factura:", "Forma de pago:")
-            
-            impuestos = extract_total_impuestos(pdf)
-            
-            sumas_por_iva = defaultdict(float)
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                for table in tables:
-                    for row in table:
-                        if not row or len(row) < 10:
-                            continue
-                        row = [str(cell).strip() if cell is not None else '' for cell in row]
-                        if row[0].strip().isdigit():
-                            try:
-                                precio_unitario = parse_colombian_number(row[5])
-                                iva_percent = float(row[9].replace(',', '.'))
-                                sumas_por_iva[iva_percent] += precio_unitario
-                            except Exception as e:
-                                print(f"Error procesando fila: {str(e)}")
-                                continue
-            
-            rows = []
-            for iva_percent, base_iva in sumas_por_iva.items():
-                row = create_base_row(
-                    emisor=nombre_comprador,
-                    tipo_documento="Facturas de Gastos",
-                    numero_documento=numero_documento,
-                    fecha_emision=fecha_emision,
-                    numero_factura=numero_factura,
-                    iva_percent=iva_percent,
-                    base_iva=base_iva,
-                    impuestos=impuestos
-                )
-                rows.append(row)
-            
-            return rows
-            
-    except Exception as e:
-        print(f"Error procesando facturas de gastos: {str(e)}")
-        return None
+    return process_document('Facturas de Gastos', pdf_path)
 
 def process_inventory(pdf_path):
     """Procesa el inventario de un documento PDF"""
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            first_page = pdf.pages[0]
-            text = first_page.extract_text()
-            
-            nit_emisor = extract_field(text, "Nit del Emisor:", "País:")
-            numero_factura = extract_field(text, "Número de Factura:", "Forma de pago:")
-            
-            inventory_items = []
-            
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                
-                for table in tables:
-                    for row in table:
-                        if not row or len(row) < 11:
-                            continue
-                            
-                        row = [str(cell).strip() if cell is not None else '' for cell in row]
-                        
-                        if row[0].strip().isdigit():
-                            try:
-                                item = {
-                                    "nit_emisor": nit_emisor,
-                                    "numero_factura": numero_factura,
-                                    "Nro": row[0],
-                                    "Codigo": row[1],
-                                    "Descripcion": row[2],
-                                    "U/M": row[3],
-                                    "Cantidad": parse_colombian_number(row[4]),
-                                    "Precio_unitario": parse_colombian_number(row[5].replace('$', '')),
-                                    "Descuento": parse_colombian_number(row[6].replace('$', '')),
-                                    "Recargo": parse_colombian_number(row[7].replace('$', '')),
-                                    "IVA": parse_colombian_number(row[8].replace('$', '')),
-                                    "Porcentaje_IVA": float(row[9].replace('%', '').strip() or '0'),
-                                    "INC": parse_colombian_number(row[10].replace('$', '')),
-                                    "Porcentaje_INC": float(row[11].replace('%', '').strip() or '0'),
-                                    "Precio_venta": parse_colombian_number(row[12].replace('$', ''))
-                                }
-                                inventory_items.append(item)
-                            except Exception as e:
-                                print(f"Error procesando línea de inventario: {row}")
-                                print(f"Error: {str(e)}")
-                                continue
-            
-            return inventory_items
-            
+        with open_document(pdf_path) as document:
+            cells, widths = item_cells(document, min_cells=11)
+            return inventory_rows(cells, widths, document.header_fields)
     except Exception as e:
         print(f"Error procesando inventario: {str(e)}")
         return None
 
+def iter_extract(paths, doc_type, workers=0, cache=None, item_engine=None, own_nit=None,
+                 timeout=DEFAULT_TIMEOUT, max_memory_mb=DEFAULT_MAX_MEMORY_MB):
+    """Genera un ExtractionResult por documento apenas se termina de extraer.
+
+    Para lotes grandes desde código sin interfaz: los resultados no se
+    acumulan y las páginas de pdfplumber se liberan al leerlas, así la memoria
+    no crece con el lote. Con workers=0 se extrae en este proceso, en el orden
+    de `paths`; con workers > 0, en procesos aislados (orden de terminación)
+    con `timeout` segundos por documento y `max_memory_mb` por proceso.
+    doc_type puede ser un tipo de DOCUMENT_SPECS o AUTO_TYPE.
+    """
+    # Import local: extraction_engine importa este módulo
+    from .extraction_engine import ExtractionEngine
+    engine = ExtractionEngine(workers, cache=cache, item_engine=item_engine, own_nit=own_nit,
+                              timeout=timeout, max_memory_mb=max_memory_mb)
+    yield from engine.extract(paths, doc_type)
+
 class ValidatorTab(QWidget):
     def __init__(self):
         super().__init__()
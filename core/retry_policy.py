@@ -0,0 +1,147 @@
+import heapq
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+# Reintentos de un CUFE fallido
+MAX_ATTEMPTS = 3
+BASE_DELAY = 10
+MAX_DELAY = 120
+
+# Circuit breaker del portal de la DIAN
+BREAKER_WINDOW = 20
+BREAKER_MIN_CALLS = 8
+BREAKER_FAILURE_RATE = 0.5
+BREAKER_COOLDOWN = 120
+BREAKER_POLL = 1.0
+# Un intento de prueba sin resultado después de esto se da por abandonado
+BREAKER_TRIAL_TIMEOUT = 180
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class RetryScheduler:
+    """Cola diferida de CUFEs fallidos con espera exponencial y jitter"""
+
+    def __init__(self, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempts = {}
+        self.heap = []
+        self.lock = threading.Lock()
+
+    def schedule(self, cufe):
+        """Programa un nuevo intento; retorna False si el CUFE agotó sus intentos"""
+        with self.lock:
+            attempt = self.attempts.get(cufe, 1)
+            if attempt >= self.max_attempts:
+                return False
+            self.attempts[cufe] = attempt + 1
+
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+            delay = random.uniform(delay / 2, delay)
+            heapq.heappush(self.heap, (time.monotonic() + delay, cufe))
+
+        logging.info(f"CUFE {cufe} reprogramado (intento {attempt + 1}) en {delay:.0f}s")
+        return True
+
+    def pop_due(self):
+        """Siguiente CUFE cuya espera ya venció (None si no hay)"""
+        with self.lock:
+            if self.heap and self.heap[0][0] <= time.monotonic():
+                return heapq.heappop(self.heap)[1]
+        return None
+
+    def pending(self):
+        with self.lock:
+            return len(self.heap)
+
+    def drain(self):
+        """Retira y retorna todos los CUFEs programados, vencidos o no"""
+        with self.lock:
+            cufes = [cufe for _, cufe in sorted(self.heap)]
+            self.heap = []
+        return cufes
+
+
+class CircuitBreaker:
+    """Detiene a todos los navegadores cuando la tasa de fallos del portal se dispara.
+
+    Tras el enfriamiento deja pasar un único intento de prueba: si funciona
+    se cierra el circuito, si falla se vuelve a abrir. Si quien lo tomó no
+    llega a llamar al portal debe devolverlo con release(); uno que no reporta
+    nada en trial_timeout segundos se entrega a otro navegador.
+    """
+
+    def __init__(self, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 failure_rate=BREAKER_FAILURE_RATE, cooldown=BREAKER_COOLDOWN,
+                 trial_timeout=BREAKER_TRIAL_TIMEOUT):
+        self.results = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.trial_timeout = trial_timeout
+        self.state = CLOSED
+        self.opened_at = 0
+        self.trial_running = False
+        self.trial_started = 0
+        self.lock = threading.Lock()
+
+    def record(self, success):
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.trial_running = False
+                if success:
+                    logging.info("Portal DIAN recuperado, se reanudan las búsquedas")
+                    self.state = CLOSED
+                    self.results.clear()
+                else:
+                    self.open()
+                return
+
+            self.results.append(success)
+            failures = self.results.count(False)
+            if (self.state == CLOSED and len(self.results) >= self.min_calls
+                    and failures / len(self.results) >= self.failure_rate):
+                self.open()
+
+    def open(self):
+        logging.warning(f"Demasiados fallos en el portal DIAN; pausando búsquedas {self.cooldown}s")
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+
+    def acquire(self):
+        """True si se puede llamar al portal en este momento"""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+            if (self.state == HALF_OPEN and self.trial_running
+                    and time.monotonic() - self.trial_started >= self.trial_timeout):
+                logging.warning("El intento de prueba del portal no reportó resultado; se reintenta")
+                self.trial_running = False
+            if self.state == HALF_OPEN and not self.trial_running:
+                self.trial_running = True
+                self.trial_started = time.monotonic()
+                return True
+            return False
+
+    def release(self):
+        """Devuelve el intento de prueba sin resultado (no se llegó a llamar al portal)"""
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.trial_running = False
+
+    def wait(self, should_continue):
+        """Bloquea mientras el circuito esté abierto; False si se canceló la espera"""
+        while not self.acquire():
+            if not should_continue():
+                return False
+            time.sleep(BREAKER_POLL)
+        return True
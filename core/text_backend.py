@@ -0,0 +1,149 @@
+import os
+
+import pdfplumber
+
+try:
+    import pypdfium2
+except ImportError:  # pypdfium2 es opcional: se usa PyPDF2 o pdfplumber
+    pypdfium2 = None
+
+try:
+    from PyPDF2 import PdfReader
+except ImportError:
+    PdfReader = None
+
+# Permite forzar un backend: pypdfium2, pypdf2 o pdfplumber
+TEXT_BACKEND_ENV = "DIAN_TEXT_BACKEND"
+
+
+class PdfplumberText:
+    """Texto con el análisis de layout de pdfplumber (el más lento)"""
+
+    name = "pdfplumber"
+    layout = True
+
+    def __init__(self, path):
+        self.pdf = pdfplumber.open(path)
+
+    def __len__(self):
+        return len(self.pdf.pages)
+
+    def page_text(self, index):
+        return self.pdf.pages[index].extract_text() or ""
+
+    def text_tops(self, index, needle):
+        """Sin posiciones de texto: no se puede recortar la página"""
+        return None
+
+    def close(self):
+        self.pdf.close()
+
+
+class PyPDF2Text:
+    """Texto plano con PyPDF2 (Python puro, sin análisis de layout)"""
+
+    name = "pypdf2"
+    layout = False
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.reader = PdfReader(self.file)
+
+    def __len__(self):
+        return len(self.reader.pages)
+
+    def page_text(self, index):
+        return self.reader.pages[index].extract_text() or ""
+
+    def text_tops(self, index, needle):
+        return None
+
+    def close(self):
+        self.file.close()
+
+
+class PdfiumText:
+    """Texto plano con pdfium (código nativo, el más rápido)"""
+
+    name = "pypdfium2"
+    layout = False
+
+    def __init__(self, path):
+        self.pdf = pypdfium2.PdfDocument(path)
+        # Solo la última página queda abierta: el textpage de pdfium guarda
+        # cada carácter con su posición (~2 MB por página de factura)
+        self.index = None
+        self.page = None
+        self.text = None
+
+    def __len__(self):
+        return len(self.pdf)
+
+    def textpage(self, index):
+        if index != self.index:
+            self.release()
+            self.page = self.pdf[index]
+            self.text = self.page.get_textpage()
+            self.index = index
+        return self.page, self.text
+
+    def release(self):
+        if self.page is not None:
+            self.text.close()
+            self.page.close()
+        self.index = self.page = self.text = None
+
+    def page_text(self, index):
+        # pdfium separa las líneas con \r\n; los extractores esperan \n
+        return self.textpage(index)[1].get_text_range().replace("\r\n", "\n")
+
+    def text_tops(self, index, needle):
+        """Distancia desde el borde superior de la página a cada aparición de `needle`"""
+        page, textpage = self.textpage(index)
+        height = page.get_height()
+        searcher = textpage.search(needle, match_case=True)
+        tops = []
+        try:
+            while True:
+                found = searcher.get_next()
+                if not found:
+                    break
+                top = textpage.get_charbox(found[0])[3]
+                tops.append(height - top)
+        finally:
+            searcher.close()
+        return tops
+
+    def close(self):
+        self.release()
+        self.pdf.close()
+
+
+BACKENDS = {
+    PdfiumText.name: PdfiumText,
+    PyPDF2Text.name: PyPDF2Text,
+    PdfplumberText.name: PdfplumberText
+}
+
+
+def available_backends():
+    """Backends instalados, del más rápido al más lento"""
+    names = []
+    if pypdfium2 is not None:
+        names.append(PdfiumText.name)
+    if PdfReader is not None:
+        names.append(PyPDF2Text.name)
+    names.append(PdfplumberText.name)
+    return names
+
+
+def default_backend():
+    name = os.environ.get(TEXT_BACKEND_ENV, "").strip().lower()
+    if name in available_backends():
+        return name
+    return available_backends()[0]
+
+
+def open_text_backend(path, name=None):
+    """Abre el PDF con el backend de texto indicado (o el más rápido disponible)"""
+    return BACKENDS[name or default_backend()](path)
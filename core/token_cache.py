@@ -0,0 +1,62 @@
+import logging
+import os
+import threading
+
+from core.download_stage import extract_token
+
+# Archivo histórico donde las versiones anteriores guardaban "cufe: url"
+URLS_FILE = "urls.txt"
+
+
+class TokenCache:
+    """Tokens de descarga ya resueltos, indexados por CUFE.
+
+    Permite intentar la descarga directa de DownloadPDF sin pasar por el
+    navegador ni el CAPTCHA cuando el CUFE ya fue buscado antes.
+    """
+
+    def __init__(self):
+        self.tokens = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def load_urls_file(self, path=URLS_FILE):
+        """Carga los tokens de un archivo con líneas 'cufe: url' (formato de urls.txt)"""
+        if not os.path.exists(path):
+            return 0
+
+        loaded = 0
+        with open(path, "r", encoding="utf-8", errors="ignore") as file:
+            for line in file:
+                cufe, sep, url = line.partition(": ")
+                if not sep:
+                    continue
+                token = extract_token(url.strip())
+                if token:
+                    self.put(cufe.strip(), token)
+                    loaded += 1
+
+        logging.info(f"Tokens cargados desde {path}: {loaded}")
+        return loaded
+
+    def load_journal(self, journal):
+        """Carga los tokens capturados registrados en el journal de la carpeta"""
+        tokens = journal.tokens()
+        with self.lock:
+            self.tokens.update(tokens)
+        return len(tokens)
+
+    def get(self, cufe):
+        with self.lock:
+            return self.tokens.get(cufe)
+
+    def put(self, cufe, token):
+        with self.lock:
+            self.tokens[cufe] = token
+
+    def invalidate(self, cufe):
+        """Descarta un token vencido o rechazado por la DIAN"""
+        with self.lock:
+            self.tokens.pop(cufe, None)
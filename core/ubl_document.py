@@ -0,0 +1,304 @@
+import io
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from .field_extractor import HEADER_FIELDS, TOTALS_FIELDS
+
+# Archivos que se leen como XML UBL en lugar de PDF
+XML_EXTENSIONS = (".xml", ".zip")
+
+NS = {
+    "cac": "urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2",
+    "cbc": "urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2"
+}
+
+# Tipo de documento según el elemento raíz (la factura se resuelve en venta o
+# compra con el NIT de la empresa, igual que la del PDF)
+ROOT_TYPES = {
+    "Invoice": 'Factura de Venta',
+    "CreditNote": 'Nota Crédito',
+    "DebitNote": 'Nota Débito'
+}
+# Elemento de cada línea y el de su cantidad
+LINE_TAGS = {
+    "InvoiceLine": "InvoicedQuantity",
+    "CreditNoteLine": "CreditedQuantity",
+    "DebitNoteLine": "DebitedQuantity"
+}
+
+# Códigos de tributo de la DIAN -> concepto de "Datos Totales" (los demás van a Otros Impuestos)
+IVA_SCHEME = "01"
+INC_SCHEME = "04"
+TAX_SCHEMES = {IVA_SCHEME: 'Total IVA', INC_SCHEME: 'Total INC', "22": 'Total Bolsas',
+               "34": 'IBUA', "35": 'ICUI'}
+WITHHOLDING_SCHEMES = {"05": 'Rete IVA', "06": 'Rete Fuente', "07": 'Rete ICA'}
+OTHER_TAXES = 'Otros Impuestos'
+
+# CUFE/CUDE: el downloader lo usa en el nombre del PDF
+CUFE_PATTERN = re.compile(r"[0-9a-f]{96}")
+# El primer UUID del XML es el CUFE/CUDE del documento (en el AttachedDocument,
+# el de la factura adjunta); se busca en los bytes sin analizar el XML
+UUID_PATTERN = re.compile(rb"<(?:[\w.-]+:)?UUID\b[^>]*>\s*([0-9a-fA-F]{96})\s*<")
+
+CENT = Decimal("0.01")
+
+
+def is_xml_source(path):
+    return isinstance(path, str) and path.lower().endswith(XML_EXTENSIONS)
+
+
+def local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def to_decimal(text):
+    try:
+        return Decimal((text or "0").strip())
+    except InvalidOperation:
+        return Decimal(0)
+
+
+def colombian_amount(value):
+    """Monto con el formato del PDF: 1.234,56"""
+    text = f"{value.quantize(CENT, rounding=ROUND_HALF_UP):,.2f}"
+    return text.replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def percent_text(value):
+    """Porcentaje con el formato de la grilla del PDF: 19.00"""
+    return f"{value.quantize(CENT, rounding=ROUND_HALF_UP):.2f}"
+
+
+def tax_cells(tax):
+    """(monto, %) de un tributo de la línea como los muestra el PDF"""
+    if tax is None:
+        return "", ""
+    amount, percent = tax
+    return colombian_amount(amount), percent_text(percent)
+
+
+def pdf_date(text):
+    """AAAA-MM-DD -> DD/MM/AAAA, como la fecha de emisión del PDF"""
+    parts = (text or "").strip().split("-")
+    if len(parts) != 3:
+        return (text or "").strip()
+    year, month, day = parts
+    return f"{day}/{month}/{year}"
+
+
+def iter_children(source):
+    """(nombre del elemento raíz, hijo directo) a medida que se termina de leer
+    cada hijo; después se descarta, así solo hay un hijo en memoria a la vez"""
+    depth = 0
+    root = None
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            yield local_name(root.tag), element
+            element.clear()
+            root.remove(element)
+
+
+class UblDocument:
+    """Documento electrónico de la DIAN leído de su XML UBL 2.1.
+
+    Acepta el AttachedDocument (con la factura o nota como CDATA), el
+    Invoice/CreditNote/DebitNote suelto, o un .zip que contenga alguno. Ofrece
+    lo que run_spec usa de ParsedDocument (header_fields, item_tables y los
+    totales de impuestos) con los mismos textos y formatos del PDF, así que
+    produce las mismas filas sin análisis de layout ni riesgo de columnas
+    corridas. Se lee con iterparse: cada línea se convierte y se descarta.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.doc_type = None
+        self.cufe = None
+        self.header = dict.fromkeys(HEADER_FIELDS, "")
+        self.tax_amounts = {name: Decimal(0) for name in TOTALS_FIELDS}
+        self.rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """El archivo se cierra apenas se termina de leer"""
+
+    def load(self):
+        if self.rows is not None:
+            return
+        self.rows = []
+        if self.path.lower().endswith(".zip"):
+            with zipfile.ZipFile(self.path) as archive:
+                for name in archive.namelist():
+                    if name.lower().endswith(".xml"):
+                        with archive.open(name) as stream:
+                            if self.read(stream):
+                                return
+        else:
+            with open(self.path, "rb") as stream:
+                if self.read(stream):
+                    return
+        raise ValueError("No se encontró una factura o nota UBL en el XML")
+
+    def read(self, source):
+        """Lee un XML; True si era (o contenía) una factura o nota"""
+        embedded = None
+        for root_name, child in iter_children(source):
+            name = local_name(child.tag)
+            if root_name == "AttachedDocument":
+                # La factura firmada va como texto dentro del adjunto
+                if name == "Attachment" and embedded is None:
+                    embedded = child.findtext("cac:ExternalReference/cbc:Description", None, NS)
+                continue
+            if root_name not in ROOT_TYPES:
+                return False
+            self.doc_type = ROOT_TYPES[root_name]
+            self.handle(name, child)
+
+        if embedded and embedded.strip():
+            text = embedded.strip()
+            if text.startswith("<?xml"):
+                # El texto ya está decodificado: se ignora la codificación declarada
+                text = text[text.index("?>") + 2:]
+            return self.read(io.BytesIO(text.encode("utf-8")))
+        return self.doc_type is not None
+
+    def handle(self, name, element):
+        if name == "ID":
+            self.header["numero_factura"] = (element.text or "").strip()
+        elif name == "UUID":
+            self.cufe = (element.text or "").strip().lower()
+        elif name == "IssueDate":
+            self.header["fecha_emision"] = pdf_date(element.text)
+        elif name == "AccountingSupplierParty":
+            self.header["razon_social"], self.header["nit_emisor"] = self.party(element)
+        elif name == "AccountingCustomerParty":
+            self.header["nombre_comprador"], self.header["documento_comprador"] = self.party(element)
+        elif name == "TaxTotal":
+            self.add_taxes(element, TAX_SCHEMES)
+        elif name == "WithholdingTaxTotal":
+            self.add_taxes(element, WITHHOLDING_SCHEMES)
+        elif name in LINE_TAGS:
+            self.rows.append(self.line_row(element, LINE_TAGS[name]))
+
+    def party(self, element):
+        """(razón social, NIT sin dígito de verificación) de un emisor o adquiriente"""
+        name = element.findtext("cac:Party/cac:PartyTaxScheme/cbc:RegistrationName", None, NS) \
+            or element.findtext("cac:Party/cac:PartyLegalEntity/cbc:RegistrationName", "", NS)
+        nit = element.findtext("cac:Party/cac:PartyTaxScheme/cbc:CompanyID", None, NS) \
+            or element.findtext("cac:Party/cac:PartyLegalEntity/cbc:CompanyID", "", NS)
+        return name.strip(), nit.strip()
+
+    def add_taxes(self, element, schemes):
+        for subtotal in element.findall("cac:TaxSubtotal", NS):
+            scheme = subtotal.findtext("cac:TaxCategory/cac:TaxScheme/cbc:ID", "", NS).strip()
+            amount = to_decimal(subtotal.findtext("cbc:TaxAmount", "0", NS))
+            self.tax_amounts[schemes.get(scheme, OTHER_TAXES)] += amount
+
+    def line_row(self, line, quantity_tag):
+        """Fila de la grilla de ítems (ITEM_COLUMNS) con los textos que muestra el PDF"""
+        taxes = {}
+        for subtotal in line.findall("cac:TaxTotal/cac:TaxSubtotal", NS):
+            scheme = subtotal.findtext("cac:TaxCategory/cac:TaxScheme/cbc:ID", "", NS).strip()
+            amount, _ = taxes.get(scheme, (Decimal(0), None))
+            taxes[scheme] = (amount + to_decimal(subtotal.findtext("cbc:TaxAmount", "0", NS)),
+                             to_decimal(subtotal.findtext("cac:TaxCategory/cbc:Percent", "0", NS)))
+        # Sin el tributo la línea es excluida: el PDF deja la celda y el % vacíos
+        iva, iva_percent = tax_cells(taxes.get(IVA_SCHEME))
+        inc, inc_percent = tax_cells(taxes.get(INC_SCHEME))
+
+        descuento = recargo = Decimal(0)
+        for charge in line.findall("cac:AllowanceCharge", NS):
+            amount = to_decimal(charge.findtext("cbc:Amount", "0", NS))
+            if charge.findtext("cbc:ChargeIndicator", "", NS).strip().lower() == "true":
+                recargo += amount
+            else:
+                descuento += amount
+
+        quantity = line.find(f"cbc:{quantity_tag}", NS)
+        code = line.findtext("cac:Item/cac:StandardItemIdentification/cbc:ID", None, NS) \
+            or line.findtext("cac:Item/cac:SellersItemIdentification/cbc:ID", "", NS)
+        return [
+            line.findtext("cbc:ID", "", NS).strip(),
+            code.strip(),
+            line.findtext("cac:Item/cbc:Description", "", NS).strip(),
+            quantity.get("unitCode", "") if quantity is not None else "",
+            colombian_amount(to_decimal(quantity.text if quantity is not None else None)),
+            colombian_amount(to_decimal(line.findtext("cac:Price/cbc:PriceAmount", "0", NS))),
+            colombian_amount(descuento),
+            colombian_amount(recargo),
+            iva,
+            iva_percent,
+            inc,
+            inc_percent,
+            colombian_amount(to_decimal(line.findtext("cbc:LineExtensionAmount", "0", NS)))
+        ]
+
+    @property
+    def header_fields(self):
+        """Los mismos campos que HEADER_FIELDS extrae del PDF"""
+        self.load()
+        return self.header
+
+    def tax_totals(self):
+        """Totales por concepto, como los retorna extract_total_impuestos"""
+        self.load()
+        return {name: float(value.quantize(CENT, rounding=ROUND_HALF_UP))
+                for name, value in self.tax_amounts.items()}
+
+    def item_tables(self):
+        """Una sola tabla con todas las líneas del documento"""
+        self.load()
+        if self.rows:
+            yield self.rows
+
+
+def sniff_cufe(path):
+    """CUFE de un XML (o del primer XML de un .zip que lo tenga) sin analizar el
+    documento; None si no se encuentra o no se puede leer"""
+    try:
+        if path.lower().endswith(".zip"):
+            with zipfile.ZipFile(path) as archive:
+                for name in archive.namelist():
+                    if name.lower().endswith(".xml"):
+                        match = UUID_PATTERN.search(archive.read(name))
+                        if match:
+                            return match.group(1).decode("ascii").lower()
+            return None
+        with open(path, "rb") as stream:
+            match = UUID_PATTERN.search(stream.read())
+    except (OSError, zipfile.BadZipFile):
+        return None
+    return match.group(1).decode("ascii").lower() if match else None
+
+
+def prefer_xml(paths):
+    """Quita los PDF de los que también se seleccionó el XML: mismo nombre de
+    archivo, o el CUFE del XML en el nombre del PDF (así los nombra el descargador).
+    Se ejecuta en la interfaz, así que los XML no se analizan aquí: solo se busca
+    el CUFE; la lectura completa la hace el proceso que extrae el documento."""
+    xml_paths = [path for path in paths if is_xml_source(path)]
+    if not xml_paths:
+        return list(paths)
+
+    stems = {os.path.splitext(path)[0].lower() for path in xml_paths}
+    cufes = {sniff_cufe(path) for path in xml_paths} - {None}
+
+    def covered(path):
+        if os.path.splitext(path)[0].lower() in stems:
+            return True
+        return any(cufe in cufes for cufe in CUFE_PATTERN.findall(os.path.basename(path).lower()))
+
+    return [path for path in paths if is_xml_source(path) or not covered(path)]
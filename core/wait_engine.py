@@ -0,0 +1,99 @@
+import logging
+import time
+
+# Tiempo máximo (segundos) que se espera cada condición del flujo de búsqueda
+DEFAULT_TIMEOUTS = {
+    'pagina_cargada': 15,
+    'captcha_resuelto': 20,
+    'campo_busqueda': 10,
+    'token_en_url': 15
+}
+DEFAULT_TIMEOUT = 10
+POLL_INTERVAL = 0.2
+
+INPUT_CUFE = "input[placeholder='Ingrese el código CUFE o UUID']"
+
+# Campos ocultos donde Turnstile / reCAPTCHA dejan la respuesta una vez resuelto el reto
+CAPTCHA_RESPONSE_SCRIPT = """
+    var fields = document.querySelectorAll(
+        "[name='cf-turnstile-response'], [name='g-recaptcha-response']");
+    if (fields.length === 0) { return true; }
+    for (var i = 0; i < fields.length; i++) {
+        if (fields[i].value) { return true; }
+    }
+    return false;
+"""
+
+
+class WaitTimeout(Exception):
+    """La condición esperada no se cumplió dentro del tiempo límite"""
+
+
+class WaitEngine:
+    """Espera condiciones de la página en lugar de pausas fijas y mide cada paso"""
+
+    def __init__(self, timeouts=None, poll_interval=POLL_INTERVAL):
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        self.poll_interval = poll_interval
+        self.timings = {}
+
+    def wait_for(self, step, condition, timeout=None):
+        """Consulta `condition` hasta que sea verdadera; registra cuánto tardó el paso"""
+        if timeout is None:
+            timeout = self.timeouts.get(step, DEFAULT_TIMEOUT)
+
+        start = time.monotonic()
+        deadline = start + timeout
+        while True:
+            try:
+                result = condition()
+            except Exception:
+                # Elementos obsoletos o navegación en curso: se vuelve a intentar
+                result = False
+
+            if result:
+                self.record(step, time.monotonic() - start)
+                return result
+
+            if time.monotonic() >= deadline:
+                self.record(step, time.monotonic() - start)
+                raise WaitTimeout(f"'{step}' no se cumplió después de {timeout} segundos")
+
+            time.sleep(self.poll_interval)
+
+    def record(self, step, elapsed):
+        """Acumula la duración real de un paso"""
+        self.timings.setdefault(step, []).append(elapsed)
+        logging.debug(f"Paso '{step}' completado en {elapsed:.2f}s")
+
+    def summary(self):
+        """Resumen legible de los tiempos promedio y máximo por paso"""
+        lines = []
+        for step, values in self.timings.items():
+            average = sum(values) / len(values)
+            lines.append(f"{step}: {len(values)} veces, promedio {average:.2f}s, máximo {max(values):.2f}s")
+        return "\n".join(lines)
+
+
+# Condiciones reutilizables; reciben el WebDriver de Selenium
+def page_loaded(driver):
+    """La página terminó de cargar"""
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+def captcha_cleared(driver):
+    """El CAPTCHA ya fue resuelto (o la página no tiene CAPTCHA)"""
+    return bool(driver.execute_script(CAPTCHA_RESPONSE_SCRIPT))
+
+
+def element_present(driver, css_selector):
+    """Existe al menos un elemento visible para el selector"""
+    elements = driver.find_elements("css selector", css_selector)
+    return any(element.is_displayed() for element in elements)
+
+
+def url_has_token(driver):
+    """La URL actual ya contiene el Token del documento"""
+    return "token=" in driver.current_url.lower()
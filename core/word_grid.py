@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+
+# Motores para las filas de ítems: detección de tablas de pdfplumber o
+# asignación de palabras a la cuadrícula de líneas con NumPy
+ITEM_ENGINE_TABLES = "tablas"
+ITEM_ENGINE_WORDS = "palabras"
+ITEM_ENGINES = (ITEM_ENGINE_TABLES, ITEM_ENGINE_WORDS)
+ITEM_ENGINE_ENV = "DIAN_ITEM_ENGINE"
+
+# Mismas tolerancias que usa pdfplumber por defecto
+SNAP_TOLERANCE = 3
+Y_TOLERANCE = 3
+
+
+def default_item_engine():
+    name = os.environ.get(ITEM_ENGINE_ENV, "").strip().lower()
+    return name if name in ITEM_ENGINES else ITEM_ENGINE_TABLES
+
+
+def cluster_labels(values, tolerance=SNAP_TOLERANCE):
+    """Agrupa posiciones cercanas (los bordes de un rectángulo salen duplicados).
+
+    Retorna la posición media de cada grupo y el grupo de cada valor.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return np.empty(0), np.empty(0, dtype=int)
+    order = np.argsort(values)
+    sorted_values = values[order]
+    group_of_sorted = np.concatenate(([0], np.cumsum(np.diff(sorted_values) > tolerance)))
+    labels = np.empty(len(values), dtype=int)
+    labels[order] = group_of_sorted
+    centers = np.bincount(labels, weights=values) / np.bincount(labels)
+    return centers, labels
+
+
+def cell_text(words):
+    """Texto de una celda: líneas por `top` separadas con \\n, palabras con espacio"""
+    lines = []
+    current = []
+    line_top = None
+    for word in sorted(words, key=lambda word: (word["top"], word["x0"])):
+        if line_top is not None and word["top"] - line_top > Y_TOLERANCE:
+            lines.append(current)
+            current = []
+            line_top = None
+        if line_top is None:
+            line_top = word["top"]
+        current.append(word)
+    if current:
+        lines.append(current)
+    return "\n".join(" ".join(word["text"] for word in sorted(line, key=lambda word: word["x0"]))
+                     for line in lines)
+
+
+def extract_word_grid(page, columns=None):
+    """Filas de la grilla a partir de extract_words() y las líneas de la página.
+
+    Las fronteras de fila salen de las líneas horizontales. Las de columna, de
+    la plantilla del emisor (`columns`) o de las líneas verticales que cruzan
+    cada franja de fila (así los subtítulos del encabezado no parten las celdas
+    de los ítems). Cada palabra va a la celda que contiene su centro. Retorna
+    una lista de tablas con la misma forma que extract_tables(), o None si la
+    página no tiene líneas suficientes para armar la cuadrícula.
+    """
+    edges = page.edges
+    horizontal = [edge["top"] for edge in edges if edge["orientation"] == "h"]
+    vertical = [edge for edge in edges if edge["orientation"] == "v"]
+    rows, _ = cluster_labels(horizontal)
+    if len(rows) < 2 or (columns is None and not vertical):
+        return None
+
+    middles = (rows[:-1] + rows[1:]) / 2
+    if columns is None:
+        columns, labels = cluster_labels([edge["x0"] for edge in vertical])
+        tops = np.array([edge["top"] for edge in vertical])
+        bottoms = np.array([edge["bottom"] for edge in vertical])
+        # crosses[c, r]: alguna línea de la columna c atraviesa la franja r
+        edge_crosses = (tops[:, None] <= middles[None, :] + SNAP_TOLERANCE) & \
+                       (bottoms[:, None] >= middles[None, :] - SNAP_TOLERANCE)
+        crosses = np.zeros((len(columns), len(middles)), dtype=bool)
+        np.logical_or.at(crosses, labels, edge_crosses)
+    else:
+        columns = np.asarray(columns, dtype=float)
+        crosses = np.ones((len(columns), len(middles)), dtype=bool)
+
+    words = page.extract_words()
+    if not words:
+        return []
+
+    centers_x = np.array([(word["x0"] + word["x1"]) / 2 for word in words])
+    centers_y = np.array([(word["top"] + word["bottom"]) / 2 for word in words])
+    row_index = np.searchsorted(rows, centers_y) - 1
+    in_rows = (row_index >= 0) & (row_index < len(middles))
+
+    table = []
+    for row in np.unique(row_index[in_rows]):
+        boundaries = columns[crosses[:, row]]
+        if len(boundaries) < 2:
+            continue
+        members = np.flatnonzero(row_index == row)
+        column_index = np.searchsorted(boundaries, centers_x[members]) - 1
+        cells = [[] for _ in range(len(boundaries) - 1)]
+        for position, column in zip(members, column_index):
+            if 0 <= column < len(cells):
+                cells[column].append(words[position])
+        table.append([cell_text(cell) for cell in cells])
+    return [table]
@@ -0,0 +1,194 @@
+import multiprocessing
+import time
+from multiprocessing.connection import wait
+
+try:
+    import psutil
+except ImportError:  # Está en requirements.txt; sin él no hay límite de memoria (se avisa)
+    psutil = None
+
+# Tiempo máximo por documento y memoria máxima de un proceso trabajador
+DEFAULT_TIMEOUT = 300
+DEFAULT_MAX_MEMORY_MB = 2048
+# Cada cuánto se revisan tiempos, memoria y procesos caídos mientras se espera
+POLL_INTERVAL = 0.2
+
+
+class WorkerFailure(Exception):
+    """El trabajo no terminó: el proceso se detuvo por tiempo o memoria, o se cayó"""
+
+
+def worker_main(connection):
+    """Ciclo de un proceso trabajador: recibe (función, argumentos) y responde
+    (True, resultado) o (False, mensaje de error)"""
+    while True:
+        try:
+            task = connection.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        function, args = task
+        try:
+            reply = (True, function(*args))
+        except Exception as e:
+            reply = (False, f"{type(e).__name__}: {str(e)}")
+        try:
+            connection.send(reply)
+        except Exception as e:
+            # El resultado no se pudo serializar
+            connection.send((False, str(e)))
+
+
+class Worker:
+    """Un proceso trabajador con su propio canal: se sabe qué documento tiene
+    y se puede matar sin afectar a los demás"""
+
+    def __init__(self, context):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.args = None
+        self.started = None
+
+    def submit(self, function, args):
+        self.args = args
+        self.started = time.monotonic()
+        self.connection.send((function, args))
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def rss_mb(self):
+        if psutil is None:
+            return 0.0
+        try:
+            return psutil.Process(self.process.pid).memory_info().rss / (1024 * 1024)
+        except psutil.Error:
+            return 0.0
+
+    def stop(self):
+        """Pide al proceso que termine; si no responde, lo mata"""
+        try:
+            self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class IsolatedWorkerPool:
+    """Procesos que ejecutan un trabajo a la vez con tiempo y memoria limitados.
+
+    A diferencia de ProcessPoolExecutor, un PDF que se cuelga, agota la memoria
+    o tumba su proceso no detiene el lote: ese proceso se mata, se reemplaza
+    por uno nuevo y el trabajo se reporta con WorkerFailure ("timeout",
+    "memoria excedida" o "worker crashed"). Sin psutil no hay límite de
+    memoria y se avisa al crear el pool.
+    """
+
+    def __init__(self, max_workers, timeout=DEFAULT_TIMEOUT, max_memory_mb=DEFAULT_MAX_MEMORY_MB,
+                 on_wait=None):
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.max_memory_mb = max_memory_mb
+        if max_memory_mb and psutil is None:
+            print(f"Advertencia: psutil no está instalado, no se aplica el límite de "
+                  f"{max_memory_mb:g} MB por documento (pip install psutil)")
+        # Se llama mientras se esperan resultados (por ejemplo, para refrescar la interfaz)
+        self.on_wait = on_wait
+        self.context = multiprocessing.get_context()
+        self.idle = []
+        self.busy = []
+        # Procesos reemplazados por tiempo, memoria o caída (para diagnóstico)
+        self.recycled = 0
+        self.cancelled = False
+
+    def failure(self, worker):
+        """Motivo para detener el trabajo del proceso, o None si puede seguir"""
+        if self.timeout and worker.elapsed() > self.timeout:
+            return f"timeout (más de {self.timeout:g} s)"
+        if self.max_memory_mb and worker.rss_mb() > self.max_memory_mb:
+            return f"memoria excedida (más de {self.max_memory_mb:g} MB)"
+        return None
+
+    def collect(self, worker, ready):
+        """None si el trabajo sigue en curso; si no, (resultado, error, sano).
+        Un proceso que no quedó sano se mata y se reemplaza."""
+        if worker.connection in ready:
+            try:
+                ok, value = worker.connection.recv()
+                if ok:
+                    return value, None, True
+                return None, WorkerFailure(value), True
+            except (EOFError, OSError):
+                pass  # Canal cerrado: el proceso se cayó
+        if not worker.process.is_alive():
+            return None, WorkerFailure(f"worker crashed (código {worker.process.exitcode})"), False
+        reason = self.failure(worker)
+        if reason:
+            return None, WorkerFailure(reason), False
+        return None
+
+    def cancel(self):
+        """Detiene run(): los trabajos en curso se descartan y los pendientes no se envían.
+        Se puede llamar desde on_wait."""
+        self.cancelled = True
+
+    def run(self, function, jobs):
+        """Genera (args, resultado, error) por cada tupla de argumentos de `jobs`,
+        en orden de terminación y con a lo sumo un trabajo por proceso"""
+        jobs = iter(jobs)
+        pending = True
+        while True:
+            if self.cancelled:
+                for worker in self.busy:
+                    worker.kill()
+                self.busy = []
+                return
+            while pending and len(self.busy) < self.max_workers:
+                args = next(jobs, None)
+                if args is None:
+                    pending = False
+                    break
+                worker = self.idle.pop() if self.idle else Worker(self.context)
+                worker.submit(function, args)
+                self.busy.append(worker)
+            if not self.busy:
+                return
+
+            handles = [worker.connection for worker in self.busy]
+            handles += [worker.process.sentinel for worker in self.busy]
+            ready = wait(handles, timeout=POLL_INTERVAL)
+            finished = []
+            for worker in list(self.busy):
+                outcome = self.collect(worker, ready)
+                if outcome is None:
+                    continue
+                result, error, healthy = outcome
+                self.busy.remove(worker)
+                if healthy:
+                    self.idle.append(worker)
+                else:
+                    worker.kill()
+                    self.recycled += 1
+                finished.append((worker.args, result, error))
+            yield from finished
+            if not finished and self.on_wait:
+                self.on_wait()
+
+    def shutdown(self):
+        """Termina todos los procesos; los que están trabajando se matan"""
+        for worker in self.busy:
+            worker.kill()
+        for worker in self.idle:
+            worker.stop()
+        self.busy = []
+        self.idle = []
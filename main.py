@@ -2,6 +2,7 @@ import sys
 from PyQt5.QtWidgets import QApplication
 from ui.main_window import MainWindow
 import logging
+import multiprocessing
 import sys
 from PyQt5.QtWidgets import QApplication
 from ui.validator_tab import ValidatorTab
@@ -52,4 +53,6 @@ def main():
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
+    # Necesario para el pool de extracción en el ejecutable congelado de Windows
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""Benchmark de DownloadWorker contra el portal DIAN simulado.
+
+Ejecuta el flujo completo (navegadores + etapa de descarga) sin depender
+de catalogo-vpfe.dian.gov.co y reporta CUFEs/minuto y latencia por etapa,
+para comparar cambios de concurrencia sin conexión.
+
+Uso:
+    python tools/benchmark_downloader.py --cufes 50 --browsers 2 --download-workers 4
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from mock_dian_server import start_server
+
+
+def fake_cufes(count, seed):
+    """CUFEs con el mismo formato (96 hex) que los reales"""
+    return [hashlib.sha384(f"{seed}-{i}".encode()).hexdigest() for i in range(count)]
+
+
+def describe(values):
+    if not values:
+        return "sin datos"
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    return (f"n={len(values)} promedio={statistics.mean(values):.2f}s "
+            f"mediana={statistics.median(values):.2f}s p95={p95:.2f}s máx={values[-1]:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del descargador DIAN")
+    parser.add_argument("--cufes", type=int, default=20)
+    parser.add_argument("--browsers", type=int, default=2)
+    parser.add_argument("--download-workers", type=int, default=4)
+    parser.add_argument("--search-latency", type=float, default=0.5)
+    parser.add_argument("--download-latency", type=float, default=0.3)
+    parser.add_argument("--search-failure-rate", type=float, default=0.0)
+    parser.add_argument("--download-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", default="benchmark")
+    args = parser.parse_args()
+
+    server = start_server(
+        search_latency=args.search_latency,
+        download_latency=args.download_latency,
+        search_failure_rate=args.search_failure_rate,
+        download_failure_rate=args.download_failure_rate
+    )
+    # Debe definirse antes de importar el worker
+    os.environ["DIAN_BASE_URL"] = server.base_url
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    from PyQt5.QtCore import QCoreApplication
+    from core.job_journal import JOURNAL_FILENAME
+    from ui.download_tab import DownloadWorker
+
+    app = QCoreApplication(sys.argv)
+    folder = tempfile.mkdtemp(prefix="benchmark_dian_")
+    cufes = fake_cufes(args.cufes, args.seed)
+
+    worker = DownloadWorker()
+    errors = []
+    worker.error.connect(lambda cufe, message: errors.append((cufe, message)))
+    worker.set_data(cufes, folder, os.path.join(folder, "benchmark.xlsx"), args.browsers)
+    worker.download_workers = args.download_workers
+
+    print(f"Portal simulado: {server.base_url}")
+    print(f"CUFEs: {len(cufes)}  navegadores: {args.browsers}  "
+          f"descargas simultáneas: {args.download_workers}")
+
+    start = time.monotonic()
+    worker.run()
+    elapsed = time.monotonic() - start
+    app.processEvents()
+    server.shutdown()
+
+    conn = sqlite3.connect(os.path.join(folder, JOURNAL_FILENAME))
+    states = dict(conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+    token_times = [row[0] for row in conn.execute(
+        "SELECT token_seconds FROM jobs WHERE token_seconds IS NOT NULL")]
+    download_times = [row[0] for row in conn.execute(
+        "SELECT download_seconds FROM jobs WHERE download_seconds IS NOT NULL")]
+    conn.close()
+
+    downloaded = states.get("downloaded", 0)
+    print()
+    print(f"Tiempo total: {elapsed:.1f}s")
+    print(f"Descargados: {downloaded}/{len(cufes)}  errores: {len(errors)}  estados: {states}")
+    print(f"Rendimiento: {downloaded * 60 / elapsed:.1f} CUFEs/minuto")
+    print()
+    print(f"Captura de token: {describe(token_times)}")
+    print(f"Descarga de PDF:  {describe(download_times)}")
+    for step, values in worker.step_timings.items():
+        print(f"  {step}: {describe(values)}")
+    print(f"\nArchivos en: {folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark de los motores de filas de ítems sobre los PDFs de muestra.
+
+Compara extract_tables() de pdfplumber ("tablas") con la asignación de
+palabras a la cuadrícula con NumPy ("palabras"): tiempo de la etapa de
+tablas por página (con la página ya analizada, para aislar el motor),
+tiempo total por archivo y coincidencia de las filas de ítems.
+
+Uso:
+    python tools/benchmark_item_engines.py --step 3
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.parsed_document import ParsedDocument
+from core.pdf_processor import process_factura_compra, process_inventory
+from core.word_grid import ITEM_ENGINE_TABLES, ITEM_ENGINE_WORDS, ITEM_ENGINES, extract_word_grid
+
+SAMPLES_DIR = os.path.join(ROOT, "prueba descargador")
+
+
+def item_rows(tables):
+    """Filas que usan los extractores (10+ celdas y número de ítem en la primera)"""
+    rows = []
+    for table in tables or []:
+        for row in table:
+            if not row or len(row) < 10:
+                continue
+            row = [str(cell).strip() if cell is not None else '' for cell in row]
+            if row[0].isdigit():
+                rows.append(row)
+    return rows
+
+
+def compare_pages(files):
+    """Tiempo de cada motor sobre las mismas páginas y filas en las que coinciden"""
+    times = {ITEM_ENGINE_TABLES: 0.0, ITEM_ENGINE_WORDS: 0.0}
+    pages = matching_pages = rows = matching_rows = 0
+    for path in files:
+        with ParsedDocument(path) as document:
+            for index in document.item_pages():
+                page = document.pdf.pages[index]
+                region = document.item_region(index)
+                if region:
+                    page = page.crop(region)
+                # Analizar la página antes de medir: el costo es el mismo para ambos
+                page.chars
+                page.edges
+
+                start = time.process_time()
+                expected = item_rows(page.extract_tables())
+                times[ITEM_ENGINE_TABLES] += time.process_time() - start
+
+                start = time.process_time()
+                found = item_rows(extract_word_grid(page))
+                times[ITEM_ENGINE_WORDS] += time.process_time() - start
+
+                pages += 1
+                matching_pages += expected == found
+                rows += len(expected)
+                matching_rows += sum(1 for row in found if row in expected)
+    return times, pages, matching_pages, rows, matching_rows
+
+
+def full_extraction(files, engine):
+    times = []
+    outputs = {}
+    for path in files:
+        start = time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()), ParsedDocument(path, item_engine=engine) as document:
+            outputs[path] = (process_factura_compra(document), process_inventory(document))
+        times.append(time.process_time() - start)
+    return times, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de motores de ítems")
+    parser.add_argument("--samples", default=SAMPLES_DIR)
+    parser.add_argument("--step", type=int, default=1, help="Usar uno de cada N archivos")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.samples, "**", "*.pdf"), recursive=True))[::args.step]
+    print(f"Archivos: {len(files)}")
+
+    times, pages, matching_pages, rows, matching_rows = compare_pages(files)
+    print(f"\nEtapa de tablas ({pages} páginas de ítems):")
+    for engine in ITEM_ENGINES:
+        print(f"  {engine:<10}{times[engine] * 1000 / max(pages, 1):>8.1f} ms/página")
+    print(f"  aceleración x{times[ITEM_ENGINE_TABLES] / max(times[ITEM_ENGINE_WORDS], 1e-9):.1f}")
+    print(f"  páginas idénticas: {matching_pages}/{pages}  filas coincidentes: {matching_rows}/{rows}")
+
+    results = {engine: full_extraction(files, engine) for engine in ITEM_ENGINES}
+    same = sum(1 for path in files
+               if results[ITEM_ENGINE_TABLES][1][path] == results[ITEM_ENGINE_WORDS][1][path])
+    print("\nExtracción completa (compra + inventario):")
+    for engine in ITEM_ENGINES:
+        print(f"  {engine:<10}{statistics.mean(results[engine][0]) * 1000:>8.1f} ms/archivo")
+    print(f"  archivos con resultado idéntico: {same}/{len(files)}")
+
+
+if __name__ == "__main__":
+    main()
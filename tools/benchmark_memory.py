@@ -0,0 +1,228 @@
+"""Memoria pico de la extracción de una factura larga sintética.
+
+Genera facturas con la misma estructura que las de la DIAN (encabezado,
+grilla de ítems con líneas en cada página y "Datos Totales" al final), con
+una fuente compartida y un flujo de contenido comprimido por página, y
+extrae cada una (factura de compra + inventario) en un proceso nuevo.
+
+La memoria se mide con tracemalloc (igual en Windows y Linux). Lo que se
+compara es la memoria de trabajo: el pico menos lo que ocupan las filas
+resultantes, que crecen con los ítems por fuerza. Al liberar cada página
+después de leer su grilla, la memoria de trabajo no debe crecer con el
+tamaño del documento: el script termina con código 1 si el crecimiento por
+página supera --max-kb-por-pagina. El RSS pico del proceso se muestra como
+referencia cuando se puede medir (psutil en Windows, resource en Unix).
+
+Uso:
+    python tools/benchmark_memory.py
+    python tools/benchmark_memory.py --paginas 10 200 --items 12
+"""
+import argparse
+import contextlib
+import gc
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+FONT_SIZE = 5
+ROW_HEIGHT = 14
+# Fronteras de las 13 columnas de la grilla (ITEM_COLUMNS)
+COLUMNS = [20 + 44 * index for index in range(14)]
+GRID_TITLES = ["Nro.", "Código", "Descripción", "U/M", "Cantidad", "Precio unitario",
+               "Descuento", "Recargo", "IVA", "%IVA", "INC", "%INC", "Precio venta"]
+HEADER_LINES = [
+    "Razón Social: PROVEEDOR SINTETICO SAS", "Nombre Comercial: PROVEEDOR",
+    "Nit del Emisor: 900123456", "País: Colombia",
+    "Número de Factura: FS-1", "Forma de pago: Contado",
+    "Fecha de Emisión: 01-01-2025", "Medio de Pago: Efectivo",
+    "Nombre o Razón Social: EMPRESA COMPRADORA SAS", "Tipo de Documento: NIT",
+    "Número Documento: 901738440", "Departamento: Bogotá"
+]
+
+
+def pdf_string(text):
+    encoded = text.encode("cp1252")
+    return b"(" + encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def text_op(x, y, text):
+    return b"BT /F1 %d Tf %.2f %.2f Td %s Tj ET\n" % (FONT_SIZE, x, y, pdf_string(text))
+
+
+def item_row(number):
+    precio = 1000 + number
+    return [str(number), f"P{number:05d}", f"PRODUCTO {number}", "UND", "1,00",
+            f"{precio:,}".replace(",", ".") + ",00", "0,00", "0,00",
+            f"{precio * 0.19:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
+            "19.00", "0,00", "0.00", f"{precio:,}".replace(",", ".") + ",00"]
+
+
+def page_content(page, pages, items_per_page):
+    """Flujo de contenido de una página: encabezado (la primera), grilla y totales (la última)"""
+    parts = []
+    y = PAGE_HEIGHT - 40
+    if page == 0:
+        for line in HEADER_LINES:
+            parts.append(text_op(COLUMNS[0], y, line))
+            y -= 10
+        y -= 10
+        parts.append(text_op(COLUMNS[0], y, "Detalles de Productos"))
+        y -= 10
+
+    rows = [GRID_TITLES] + [item_row(page * items_per_page + index + 1)
+                            for index in range(items_per_page)]
+    top = y
+    bottom = top - ROW_HEIGHT * len(rows)
+    for index, row in enumerate(rows):
+        baseline = top - ROW_HEIGHT * (index + 1) + 4
+        for column, cell in enumerate(row):
+            parts.append(text_op(COLUMNS[column] + 2, baseline, cell))
+    for index in range(len(rows) + 1):
+        line_y = top - ROW_HEIGHT * index
+        parts.append(b"%d %.2f m %d %.2f l S\n" % (COLUMNS[0], line_y, COLUMNS[-1], line_y))
+    for x in COLUMNS:
+        parts.append(b"%d %.2f m %d %.2f l S\n" % (x, top, x, bottom))
+
+    if page == pages - 1:
+        y = bottom - 20
+        parts.append(text_op(COLUMNS[0], y, "Datos Totales"))
+        parts.append(text_op(COLUMNS[0], y - 10, "Total IVA $ 190,00"))
+        parts.append(text_op(COLUMNS[0], y - 20, "Rete Fuente $ 0,00"))
+    return b"0.5 w\n" + b"".join(parts)
+
+
+def build_invoice(path, pages, items_per_page):
+    """Escribe el PDF: catálogo, árbol de páginas, fuente Helvetica y una página
+    con su propio flujo de contenido por cada página de la factura"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+    ]
+    kids = []
+    for page in range(pages):
+        content = zlib.compress(page_content(page, pages, items_per_page))
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream"
+                       % (len(content), content))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+                       % (PAGE_WIDTH, PAGE_HEIGHT, len(objects)))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as file:
+        file.write(output)
+
+
+def peak_rss_kb():
+    """RSS pico del proceso en KB, o 0 si no se puede medir"""
+    if psutil is not None:
+        peak = getattr(psutil.Process().memory_info(), "peak_wset", None)
+        if peak is not None:
+            return peak // 1024
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS lo reporta en bytes, Linux en KB
+        return peak // 1024 if sys.platform == "darwin" else peak
+    return 0
+
+
+def extract(path):
+    """Se ejecuta en el proceso hijo: extrae la factura e imprime filas, ítems, memoria
+    de trabajo y de resultados (KB de tracemalloc), RSS pico (KB) y segundos"""
+    from core.parsed_document import ParsedDocument
+    from core.pdf_processor import process_factura_compra, process_inventory
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    # Los extractores imprimen depuración; no interesa en el benchmark
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ParsedDocument(path) as document:
+            rows, _ = process_factura_compra(document)
+            inventory = process_inventory(document)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    # Con el documento cerrado solo quedan las filas
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results = current - base
+    working = peak - base - results
+    print(len(rows or []), len(inventory or []), working // 1024, results // 1024,
+          peak_rss_kb(), elapsed)
+
+
+def measure(path):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--hijo", path],
+                            check=True, capture_output=True, text=True).stdout.split()
+    rows, items, working, results, rss, elapsed = output[-6:]
+    return int(rows), int(items), int(working), int(results), int(rss), float(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria pico con facturas largas")
+    parser.add_argument("--paginas", nargs="+", type=int, default=[10, 200])
+    parser.add_argument("--items", type=int, default=12, help="Ítems por página")
+    parser.add_argument("--max-kb-por-pagina", type=float, default=20,
+                        help="Crecimiento máximo de la memoria de trabajo por página")
+    parser.add_argument("--hijo", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        extract(args.hijo)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'páginas':>8}{'ítems':>8}{'trabajo MB':>12}{'filas MB':>10}"
+              f"{'RSS pico MB':>13}{'s/página':>10}")
+        for pages in sorted(args.paginas):
+            path = os.path.join(directory, f"factura_{pages}.pdf")
+            build_invoice(path, pages, args.items)
+            rows, items, working, kept, rss, elapsed = measure(path)
+            if not rows or items != pages * args.items:
+                print(f"Extracción incompleta con {pages} páginas: {items} ítems")
+                sys.exit(1)
+            results.append((pages, working))
+            rss_text = f"{rss / 1024:.1f}" if rss else "-"
+            print(f"{pages:>8}{items:>8}{working / 1024:>12.1f}{kept / 1024:>10.1f}"
+                  f"{rss_text:>13}{elapsed / pages:>10.3f}")
+
+    if len(results) > 1:
+        (first_pages, first_peak), (last_pages, last_peak) = results[0], results[-1]
+        growth = (last_peak - first_peak) / (last_pages - first_pages)
+        print(f"\nCrecimiento: {growth:.1f} KB por página (máximo {args.max_kb_por_pagina:g})")
+        if growth > args.max_kb_por_pagina:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark de los backends de texto sobre los PDFs de muestra.
+
+Mide, por archivo, el tiempo de leer solo el encabezado y "Datos Totales"
+(lo que resuelve el backend de texto) y el de la extracción completa de una
+factura de compra (texto + tablas con pdfplumber + inventario).
+
+Uso:
+    python tools/benchmark_text_backend.py --step 5
+    python tools/benchmark_text_backend.py --backends pdfplumber pypdfium2
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.parsed_document import ParsedDocument
+from core.pdf_processor import (process_factura_compra, process_inventory,
+                                extract_total_impuestos, get_document_type)
+from core.text_backend import available_backends
+
+SAMPLES_DIR = os.path.join(ROOT, "prueba descargador")
+
+
+def text_only(path, backend):
+    with ParsedDocument(path, backend) as document:
+        document.first_page_text
+        extract_total_impuestos(document)
+        get_document_type(document)
+
+
+def full_extraction(path, backend):
+    with ParsedDocument(path, backend) as document:
+        process_factura_compra(document)
+        process_inventory(document)
+
+
+def measure(function, files, backend):
+    times = []
+    for path in files:
+        start = time.perf_counter()
+        # Los extractores imprimen depuración; no interesa en el benchmark
+        with contextlib.redirect_stdout(io.StringIO()):
+            function(path, backend)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de backends de texto")
+    parser.add_argument("--samples", default=SAMPLES_DIR)
+    parser.add_argument("--step", type=int, default=1, help="Usar uno de cada N archivos")
+    parser.add_argument("--backends", nargs="+", default=available_backends())
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.samples, "**", "*.pdf"), recursive=True))[::args.step]
+    print(f"Archivos: {len(files)}")
+
+    results = {}
+    for backend in args.backends:
+        results[backend] = (measure(text_only, files, backend),
+                            measure(full_extraction, files, backend))
+
+    baseline = results.get("pdfplumber")
+    print(f"\n{'backend':<12}{'texto ms/archivo':>18}{'completo ms/archivo':>22}{'aceleración':>14}")
+    for backend, (text_times, full_times) in results.items():
+        text_ms = statistics.mean(text_times) * 1000
+        full_ms = statistics.mean(full_times) * 1000
+        speedup = ""
+        if baseline:
+            speedup = (f"x{statistics.mean(baseline[0]) * 1000 / text_ms:.1f} / "
+                       f"x{statistics.mean(baseline[1]) * 1000 / full_ms:.2f}")
+        print(f"{backend:<12}{text_ms:>18.1f}{full_ms:>22.1f}{speedup:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Portal local que imita catalogo-vpfe.dian.gov.co para pruebas y benchmarks.
+
+Implementa el flujo que usa DownloadWorker:
+    GET  /User/SearchDocument                 formulario con el campo CUFE y el botón Buscar
+    GET  /User/Search?cufe=...                redirige a ShowDocumentToPublic con Token=
+    GET  /Document/ShowDocumentToPublic/<id>  página del documento
+    GET  /Document/DownloadPDF?trackId=&token= sirve un PDF de 'prueba descargador/'
+
+Uso:
+    python tools/mock_dian_server.py --port 8765 --search-latency 0.5 --search-failure-rate 0.1
+    set DIAN_BASE_URL=http://127.0.0.1:8765   (antes de iniciar la aplicación)
+"""
+import argparse
+import glob
+import itertools
+import os
+import random
+import secrets
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLES_DIR = os.path.join(ROOT, "prueba descargador")
+
+SEARCH_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Consulta de documentos</title></head>
+<body>
+  <form action="/User/Search" method="get">
+    <input type="text" name="cufe" placeholder="Ingrese el código CUFE o UUID">
+    <button type="submit">Buscar</button>
+  </form>
+</body>
+</html>"""
+
+DOCUMENT_PAGE = """<!DOCTYPE html>
+<html><body><h1>Documento {cufe}</h1>
+<a href="/Document/DownloadPDF?trackId={cufe}&token={token}">Descargar PDF</a>
+</body></html>"""
+
+ERROR_PAGE = """<!DOCTYPE html>
+<html><body><h1>Error</h1><p>{message}</p></body></html>"""
+
+
+class MockDianServer(ThreadingHTTPServer):
+    """Servidor con latencia y fallos configurables"""
+
+    daemon_threads = True
+
+    def __init__(self, address, search_latency=0.0, download_latency=0.0,
+                 search_failure_rate=0.0, download_failure_rate=0.0,
+                 token_ttl=None, samples_dir=SAMPLES_DIR):
+        super().__init__(address, MockDianHandler)
+        self.search_latency = search_latency
+        self.download_latency = download_latency
+        self.search_failure_rate = search_failure_rate
+        self.download_failure_rate = download_failure_rate
+        self.token_ttl = token_ttl
+        self.tokens = {}
+        self.lock = threading.Lock()
+
+        pdfs = sorted(glob.glob(os.path.join(samples_dir, "**", "*.pdf"), recursive=True))
+        if not pdfs:
+            raise FileNotFoundError(f"No hay PDFs de muestra en {samples_dir}")
+        self.pdf_cycle = itertools.cycle(pdfs)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def issue_token(self, cufe):
+        token = secrets.token_hex(32)
+        with self.lock:
+            self.tokens[(cufe, token)] = time.monotonic()
+        return token
+
+    def token_valid(self, cufe, token):
+        with self.lock:
+            issued = self.tokens.get((cufe, token))
+        if issued is None:
+            return False
+        return self.token_ttl is None or time.monotonic() - issued <= self.token_ttl
+
+    def next_pdf(self):
+        with self.lock:
+            return next(self.pdf_cycle)
+
+
+class MockDianHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_html(self, body, status=200):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+
+        if url.path == "/User/SearchDocument":
+            self.send_html(SEARCH_PAGE)
+        elif url.path == "/User/Search":
+            self.handle_search(params.get("cufe", [""])[0].strip())
+        elif url.path.startswith("/Document/ShowDocumentToPublic/"):
+            cufe = url.path.rsplit("/", 1)[-1]
+            self.send_html(DOCUMENT_PAGE.format(cufe=cufe, token=params.get("Token", [""])[0]))
+        elif url.path == "/Document/DownloadPDF":
+            self.handle_download(params.get("trackId", [""])[0], params.get("token", [""])[0])
+        else:
+            self.send_html(ERROR_PAGE.format(message="No encontrado"), status=404)
+
+    def handle_search(self, cufe):
+        server = self.server
+        time.sleep(server.search_latency)
+
+        if not cufe or random.random() < server.search_failure_rate:
+            self.send_html(ERROR_PAGE.format(message="Servicio no disponible"), status=503)
+            return
+
+        token = server.issue_token(cufe)
+        captcha = secrets.token_urlsafe(48)
+        self.send_response(302)
+        self.send_header("Location",
+                         f"/Document/ShowDocumentToPublic/{cufe}?Token={token}&captcha={captcha}")
+        self.end_headers()
+
+    def handle_download(self, cufe, token):
+        server = self.server
+        time.sleep(server.download_latency)
+
+        if random.random() < server.download_failure_rate:
+            self.send_html(ERROR_PAGE.format(message="Error interno"), status=500)
+            return
+
+        # La DIAN responde una página HTML (200) cuando el token no es válido
+        if not server.token_valid(cufe, token):
+            self.send_html(ERROR_PAGE.format(message="Token inválido o vencido"))
+            return
+
+        path = server.next_pdf()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+        with open(path, "rb") as file:
+            while True:
+                chunk = file.read(64 * 1024)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+
+
+def start_server(host="127.0.0.1", port=0, **options):
+    """Inicia el portal simulado en un hilo de fondo y lo retorna"""
+    server = MockDianServer((host, port), **options)
+    thread = threading.Thread(target=server.serve_forever, name="mock-dian", daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Portal DIAN simulado")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--search-latency", type=float, default=0.0,
+                        help="Segundos de espera al buscar un CUFE")
+    parser.add_argument("--download-latency", type=float, default=0.0,
+                        help="Segundos de espera antes de servir el PDF")
+    parser.add_argument("--search-failure-rate", type=float, default=0.0,
+                        help="Proporción de búsquedas que responden 503")
+    parser.add_argument("--download-failure-rate", type=float, default=0.0,
+                        help="Proporción de descargas que responden 500")
+    parser.add_argument("--token-ttl", type=float, default=None,
+                        help="Segundos de validez de un token (sin límite por defecto)")
+    args = parser.parse_args()
+
+    server = MockDianServer(
+        (args.host, args.port),
+        search_latency=args.search_latency,
+        download_latency=args.download_latency,
+        search_failure_rate=args.search_failure_rate,
+        download_failure_rate=args.download_failure_rate,
+        token_ttl=args.token_ttl
+    )
+    print(f"Portal DIAN simulado en {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,37 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                              QFileDialog, QLabel, QProgressDialog, QTextEdit,
-                             QMessageBox)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+                             QMessageBox, QSpinBox, QCheckBox)
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 import pandas as pd
 import os
 import logging
+import queue
+import threading
 import time
-import requests
-from seleniumbase import SB
+from core.browser_session import (BrowserSession, WarmBrowserPool, MAX_CUFES_PER_SESSION,
+                                  MAX_RSS_MB, on_search_page)
+from core.download_stage import (PDFDownloadStage, DEFAULT_DOWNLOAD_WORKERS, SEARCH_URL,
+                                 extract_token)
+from core.job_journal import JobJournal
+from core.retry_policy import RetryScheduler, CircuitBreaker
+from core.token_cache import TokenCache, URLS_FILE
+from core.wait_engine import (WaitEngine, INPUT_CUFE, page_loaded, captcha_cleared,
+                              element_present, url_has_token)
+
+# Número de navegadores que trabajan en paralelo por defecto
+DEFAULT_BROWSERS = 2
+MAX_BROWSERS = 8
+# Navegadores que se precalientan al mostrar la pestaña de descarga. Desactivado
+# por defecto: abre Chrome y resuelve el CAPTCHA moviendo el mouse real, así que
+# solo se hace si el usuario lo activa
+PREWARM_BROWSERS = 0
+# Espera de un navegador sin trabajo mientras hay descargas o reintentos pendientes
+QUEUE_POLL = 0.5
 
 class DownloadWorker(QThread):
     progress = pyqtSignal(int)
     error = pyqtSignal(str, str)
+    summary = pyqtSignal(str)
     finished = pyqtSignal()
     
     def __init__(self):
@@ -20,99 +40,344 @@ class DownloadWorker(QThread):
         self.folder_path = ""
         self.excel_path = ""
         self.is_running = True
+        self.num_browsers = DEFAULT_BROWSERS
+        self.download_workers = DEFAULT_DOWNLOAD_WORKERS
+        self.completed = 0
+        self.total = 0
+        self.downloads_pending = 0
+        self.progress_lock = threading.Lock()
+        self.token_cache = TokenCache()
+        self.step_timings = {}
+        self.browser_restarts = 0
+        self.peak_browser_rss_mb = 0.0
+        self.max_cufes_per_session = MAX_CUFES_PER_SESSION
+        self.max_browser_rss_mb = MAX_RSS_MB
+        self.warm_sessions = []
+        self.cufe_queue = None
+        self.stage = None
+        self.journal = None
+        self.retries = None
+        self.breaker = None
 
-    def process_cufe(self, sb, cufe):
+    def capture_token(self, sb, cufe, waits=None, fresh=False):
+        """Etapa de navegador: busca el CUFE y retorna el token de descarga (o None).
+        Con `fresh` (primer CUFE de un navegador recién precalentado) se usa la
+        búsqueda ya cargada; si no, se recarga y se resuelve un CAPTCHA nuevo."""
+        waits = waits or WaitEngine()
         try:
-            url = "https://catalogo-vpfe.dian.gov.co/User/SearchDocument"
             logging.info(f"Procesando CUFE: {cufe}")
             
-            sb.uc_open_with_reconnect(url, 4)
-            time.sleep(3)
+            # Un navegador precalentado ya está en la búsqueda con el CAPTCHA resuelto
+            if not (fresh and on_search_page(sb)):
+                sb.uc_open_with_reconnect(SEARCH_URL, 4)
+                waits.wait_for("pagina_cargada", lambda: page_loaded(sb.driver))
 
-            logging.info("Resolviendo CAPTCHA...")
-            sb.uc_gui_click_captcha()
-            time.sleep(4)
+                logging.info("Resolviendo CAPTCHA...")
+                sb.uc_gui_click_captcha()
+                waits.wait_for("captcha_resuelto", lambda: captcha_cleared(sb.driver))
 
-            input_field = "input[placeholder='Ingrese el código CUFE o UUID']"
-            sb.type(input_field, cufe)
-            time.sleep(2)
+            waits.wait_for("campo_busqueda", lambda: element_present(sb.driver, INPUT_CUFE))
+            sb.type(INPUT_CUFE, cufe)
 
             sb.click("button:contains('Buscar')")
-            time.sleep(5)
+            waits.wait_for("token_en_url", lambda: url_has_token(sb.driver))
 
             current_url = sb.get_current_url()
             logging.info(f"URL capturada: {current_url}")
 
-            token = None
-            if "Token=" in current_url:
-                token = current_url.split("Token=")[1].split("&")[0]
-            elif "token=" in current_url:
-                token = current_url.split("token=")[1].split("&")[0]
-
-            if token:
-                download_url = f"https://catalogo-vpfe.dian.gov.co/Document/DownloadPDF?trackId={cufe}&token={token}"
-                response = requests.get(download_url)
-                
-                if response.status_code == 200:
-                    excel_name = os.path.splitext(os.path.basename(self.excel_path))[0]
-                    filename = f"{excel_name}_{cufe}.pdf"
-                    filepath = os.path.join(self.folder_path, filename)
-                    with open(filepath, "wb") as file:
-                        file.write(response.content)
-                    logging.info(f"Archivo PDF descargado: {filename}")
-                    
-                    with open(os.path.join(self.folder_path, "links_descarga.txt"), "a") as file:
-                        file.write(f"{cufe}: {download_url}\n")
-                    return True
-                else:
-                    logging.error(f"Error al descargar el archivo PDF para el CUFE {cufe}")
-                    return False
-            else:
+            token = extract_token(current_url)
+            if not token:
                 logging.error(f"No se encontró el token en la URL para el CUFE {cufe}")
-                return False
+            return token
 
         except Exception as e:
             logging.error(f"Error procesando CUFE {cufe}: {str(e)}")
-            return False
+            return None
+
+    def report_progress(self):
+        """Suma un CUFE terminado y emite el progreso global del pool"""
+        with self.progress_lock:
+            self.completed += 1
+            value = int(self.completed * 100 / self.total)
+        self.progress.emit(value)
+
+    def retry_or_fail(self, cufe, message):
+        """Reprograma el CUFE con espera exponencial o lo da por fallido"""
+        if self.is_running and self.retries.schedule(cufe):
+            return
+        self.error.emit(cufe, message)
+        self.report_progress()
+
+    def submit_download(self, cufe, token, from_cache=False):
+        """Entrega un par (cufe, token) a la etapa de descarga"""
+        with self.progress_lock:
+            self.downloads_pending += 1
+        future = self.stage.submit(cufe, token)
+        future.add_done_callback(lambda f: self.download_done(cufe, f, from_cache))
+
+    def download_done(self, cufe, future, from_cache):
+        """Callback de la etapa de descarga. Si falla una descarga con token en
+        caché, el CUFE vuelve a la cola de los navegadores por un token nuevo"""
+        if not future.cancelled() and future.result():
+            self.report_progress()
+        else:
+            self.token_cache.invalidate(cufe)
+            self.journal.clear_token(cufe)
+            if from_cache:
+                logging.info(f"Token en caché no válido para el CUFE {cufe}, se buscará en el portal")
+                self.cufe_queue.put(cufe)
+            else:
+                self.retry_or_fail(cufe, "Error descargando PDF")
+
+        # Se descuenta al final para que next_cufe no termine antes de reencolar
+        with self.progress_lock:
+            self.downloads_pending -= 1
+
+    def has_pending_work(self):
+        with self.progress_lock:
+            downloads = self.downloads_pending > 0
+        return downloads or self.retries.pending() > 0 or not self.cufe_queue.empty()
+
+    def next_cufe(self):
+        """Siguiente CUFE para el navegador; None cuando ya no queda trabajo"""
+        while self.is_running:
+            cufe = self.retries.pop_due()
+            if cufe is not None:
+                return cufe
+            try:
+                return self.cufe_queue.get(timeout=QUEUE_POLL)
+            except queue.Empty:
+                if not self.has_pending_work():
+                    return None
+        return None
+
+    def take_warm_session(self):
+        with self.progress_lock:
+            if self.warm_sessions:
+                return self.warm_sessions.pop()
+        return None
+
+    def browser_loop(self):
+        """Sesión de navegador independiente que consume CUFEs de la cola compartida
+        y entrega los tokens a la etapa de descarga sin esperar el PDF"""
+        waits = WaitEngine()
+        session = self.take_warm_session()
+        if session is None:
+            session = BrowserSession(self.max_cufes_per_session, self.max_browser_rss_mb)
+        try:
+            # No se abre el navegador si todos los CUFEs se resolvieron con tokens en caché
+            cufe = self.next_cufe()
+            while cufe is not None:
+                # Con el portal caído todos los navegadores esperan en lugar de insistir
+                if not self.breaker.wait(lambda: self.is_running):
+                    break
+
+                try:
+                    sb = session.acquire()
+                except Exception:
+                    # El portal no se llegó a consultar: el intento de prueba queda libre
+                    self.breaker.release()
+                    self.cufe_queue.put(cufe)
+                    raise
+
+                self.journal.start_attempt(cufe)
+                start = time.monotonic()
+                token = self.capture_token(sb, cufe, waits, fresh=session.take_fresh())
+                session.mark_done()
+                self.breaker.record(bool(token))
+                if not token:
+                    self.journal.mark_failed(cufe, "No se obtuvo token")
+                    self.retry_or_fail(cufe, "Error procesando CUFE")
+                    if not session.is_alive():
+                        session.restart("el navegador dejó de responder")
+                else:
+                    self.journal.mark_token(cufe, token, time.monotonic() - start)
+                    self.token_cache.put(cufe, token)
+                    self.submit_download(cufe, token)
+
+                cufe = self.next_cufe()
+
+        except Exception as e:
+            self.error.emit("Sistema", str(e))
+        finally:
+            session.rss_mb()
+            session.close()
+            with self.progress_lock:
+                self.browser_restarts += session.restarts
+                self.peak_browser_rss_mb = max(self.peak_browser_rss_mb, session.peak_rss_mb)
+                for step, values in waits.timings.items():
+                    self.step_timings.setdefault(step, []).extend(values)
+            if waits.timings:
+                logging.info(f"Tiempos por paso ({threading.current_thread().name}):\n{waits.summary()}")
+
+    def fail_unprocessed(self, message):
+        """Marca como fallidos los CUFEs que siguen en cola o esperando reintento"""
+        leftover = self.retries.drain()
+        while True:
+            try:
+                leftover.append(self.cufe_queue.get_nowait())
+            except queue.Empty:
+                break
+        for cufe in leftover:
+            self.journal.mark_failed(cufe, message)
+            self.error.emit(cufe, message)
+            self.report_progress()
+
+    def run_summary(self):
+        """Resumen de la corrida para el log de la pestaña"""
+        counts = self.journal.counts()
+        lines = [
+            f"Descargados: {counts.get('downloaded', 0)}  Fallidos: {counts.get('failed', 0)}",
+            f"Reinicios de navegador: {self.browser_restarts}"
+        ]
+        if self.peak_browser_rss_mb:
+            lines.append(f"Memoria pico de un navegador: {self.peak_browser_rss_mb:.0f} MB")
+        return "\n".join(lines)
 
     def run(self):
+        self.stage = None
+        self.journal = None
         try:
-            with SB(uc=True, test=True, incognito=True, locale_code="en") as sb:
-                total = len(self.cufes)
-                for i, cufe in enumerate(self.cufes):
-                    if not self.is_running:
-                        break
-                        
-                    success = self.process_cufe(sb, cufe)
-                    if not success:
-                        self.error.emit(cufe, "Error procesando CUFE")
-                    
-                    self.progress.emit(int((i + 1) * 100 / total))
+            excel_name = os.path.splitext(os.path.basename(self.excel_path))[0]
+            self.journal = JobJournal(self.folder_path)
+            self.journal.add_pending(self.cufes, excel_name)
+
+            # Reanudar: solo los CUFEs que no quedaron descargados en corridas anteriores
+            remaining = self.journal.remaining(self.cufes)
+            skipped = len(self.cufes) - len(remaining)
+            if skipped:
+                logging.info(f"Reanudando descarga: {skipped} CUFEs ya descargados se omiten")
+
+            self.total = len(remaining)
+            if not self.total:
+                self.progress.emit(100)
+                return
+
+            self.token_cache.load_urls_file(URLS_FILE)
+            self.token_cache.load_urls_file(os.path.join(self.folder_path, URLS_FILE))
+            self.token_cache.load_journal(self.journal)
+
+            self.completed = 0
+            self.downloads_pending = 0
+            self.step_timings = {}
+            self.browser_restarts = 0
+            self.peak_browser_rss_mb = 0.0
+            self.cufe_queue = queue.Queue()
+            self.retries = RetryScheduler()
+            self.breaker = CircuitBreaker()
+            self.stage = PDFDownloadStage(self.folder_path, excel_name, self.download_workers,
+                                          self.journal)
+
+            # Los CUFEs con token conocido se descargan directo, sin navegador
+            direct = 0
+            for cufe in remaining:
+                token = self.token_cache.get(cufe)
+                if token:
+                    direct += 1
+                    self.submit_download(cufe, token, from_cache=True)
+                else:
+                    self.cufe_queue.put(cufe)
+
+            logging.info(f"Descargas directas con token en caché: {direct}")
+
+            num_browsers = max(1, min(self.num_browsers, self.total))
+            logging.info(f"Iniciando {num_browsers} navegador(es) para {self.total} CUFEs")
+
+            threads = []
+            for i in range(num_browsers):
+                thread = threading.Thread(
+                    target=self.browser_loop,
+                    name=f"navegador-{i + 1}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+            for thread in threads:
+                thread.join()
+
+            # Ningún navegador sigue vivo (no arrancaron o se cayeron): lo que quedó en
+            # cola no se va a procesar. Primero terminan las descargas, que pueden
+            # devolver CUFEs a la cola si su token en caché no sirvió.
+            self.stage.close(wait=True)
+            if self.is_running:
+                self.fail_unprocessed("No hay navegador disponible para buscar el CUFE")
+
+            # Sesiones precalentadas que no llegaron a usarse
+            while self.warm_sessions:
+                self.warm_sessions.pop().close()
 
         except Exception as e:
             self.error.emit("Sistema", str(e))
         finally:
+            if self.stage:
+                self.stage.close(wait=True)
+            if self.journal:
+                summary = self.run_summary()
+                logging.info(f"Resumen de descarga:\n{summary}")
+                self.summary.emit(summary)
+                self.journal.close()
             self.finished.emit()
 
-    def set_data(self, cufes, folder_path, excel_path):
+    def set_data(self, cufes, folder_path, excel_path, num_browsers=DEFAULT_BROWSERS,
+                 warm_sessions=None):
         self.cufes = cufes
         self.folder_path = folder_path
         self.excel_path = excel_path
+        self.num_browsers = num_browsers
+        self.warm_sessions = list(warm_sessions or [])
+        self.is_running = True
 
     def stop(self):
         self.is_running = False
 
 class DownloadTab(QWidget):
-    def __init__(self):
+    def __init__(self, prewarm_browsers=PREWARM_BROWSERS):
         super().__init__()
+        self.warm_pool = None
+        self.prewarm_size = max(1, prewarm_browsers)
+        self.shown_once = False
         self.setup_ui()
+        self.prewarm_check.setChecked(bool(prewarm_browsers))
+        self.prewarm_check.toggled.connect(self.toggle_prewarm)
         self.worker = DownloadWorker()
         self.worker.progress.connect(self.update_progress)
         self.worker.error.connect(self.log_error)
+        self.worker.summary.connect(self.log_viewer.append)
         self.worker.finished.connect(self.download_finished)
         self.excel_path = None
         self.folder_path = None
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.shown_once:
+            self.shown_once = True
+            if self.prewarm_check.isChecked():
+                # Se inicia después de pintar la pestaña para no retrasarla
+                QTimer.singleShot(0, self.start_prewarm)
+
+    def toggle_prewarm(self, checked):
+        if checked:
+            self.start_prewarm()
+        elif self.warm_pool:
+            self.warm_pool.close()
+            self.warm_pool = None
+
+    def start_prewarm(self):
+        """Arranca en segundo plano navegadores listos en la página de búsqueda"""
+        if self.warm_pool or self.worker.isRunning():
+            return
+        self.warm_pool = WarmBrowserPool(self.prewarm_size)
+        self.warm_pool.start()
+
+    def shutdown(self):
+        """Cierra la descarga en curso y los navegadores precalentados"""
+        if self.worker.isRunning():
+            self.worker.stop()
+            self.worker.wait()
+        if self.warm_pool:
+            self.warm_pool.close()
+
     def setup_ui(self):
         layout = QVBoxLayout(self)
 
@@ -257,7 +522,26 @@ class DownloadTab(QWidget):
             }
         """)
         
+        browsers_label = QLabel("Navegadores en paralelo:")
+        self.browsers_spin = QSpinBox()
+        self.browsers_spin.setRange(1, MAX_BROWSERS)
+        self.browsers_spin.setValue(DEFAULT_BROWSERS)
+        self.browsers_spin.setToolTip(
+            "Cantidad de sesiones de navegador que descargan CUFEs al mismo tiempo.\n"
+            "Cada sesión consume CPU y memoria adicionales."
+        )
+
+        self.prewarm_check = QCheckBox("Precalentar navegador")
+        self.prewarm_check.setToolTip(
+            "Abre un navegador en segundo plano y resuelve el CAPTCHA antes de iniciar,\n"
+            "para que la primera descarga no espere el arranque de Chrome.\n"
+            "Mientras lo resuelve mueve el mouse."
+        )
+
         control_layout.addStretch()
+        control_layout.addWidget(self.prewarm_check)
+        control_layout.addWidget(browsers_label)
+        control_layout.addWidget(self.browsers_spin)
         control_layout.addWidget(self.start_btn)
         control_layout.addWidget(self.stop_btn)
         control_layout.addStretch()
@@ -309,9 +593,20 @@ class DownloadTab(QWidget):
                 QMessageBox.warning(self, "Advertencia", "No hay CUFEs para procesar")
                 return
             
-            self.worker.set_data(cufes, self.folder_path, self.excel_path)
+            num_browsers = self.browsers_spin.value()
+            warm_sessions = []
+            if self.warm_pool:
+                # Las sesiones listas pasan a la descarga; las que aún se están
+                # precalentando se cierran y el pool se vuelve a llenar al terminar
+                warm_sessions = self.warm_pool.take(num_browsers)
+                self.warm_pool.close()
+                self.warm_pool = None
+            self.worker.set_data(cufes, self.folder_path, self.excel_path,
+                                 num_browsers, warm_sessions)
             
             self.start_btn.setEnabled(False)
+            self.browsers_spin.setEnabled(False)
+            self.prewarm_check.setEnabled(False)
             self.stop_btn.setEnabled(True)
             self.excel_btn.setEnabled(False)
             self.folder_btn.setEnabled(False)
@@ -341,5 +636,11 @@ class DownloadTab(QWidget):
         self.stop_btn.setEnabled(False)
         self.excel_btn.setEnabled(True)
         self.folder_btn.setEnabled(True)
+        self.browsers_spin.setEnabled(True)
+        self.prewarm_check.setEnabled(True)
+        if self.prewarm_check.isChecked():
+            # La señal se emite al final de run(): se espera a que el hilo termine
+            self.worker.wait()
+            self.start_prewarm()
         self.log_viewer.append("Proceso de descarga finalizado")
         QMessageBox.information(self, "Completado", "Proceso de descarga finalizado")
\ No newline at end of file
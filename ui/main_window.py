@@ -1,10 +1,10 @@
 from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QStackedWidget, QHBoxLayout, QPushButton
 from PyQt5.QtCore import Qt
-from .download_tab import DownloadTab
+from .download_tab import DownloadTab, PREWARM_BROWSERS
 from .validator_tab import ValidatorTab
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, prewarm_browsers=PREWARM_BROWSERS):
         super().__init__()
         self.setWindowTitle('DIAN Processor')
         self.setMinimumSize(1200, 800)
@@ -52,7 +52,7 @@ class MainWindow(QMainWindow):
         
         # Stack de widgets
         self.stack = QStackedWidget()
-        self.download_tab = DownloadTab()
+        self.download_tab = DownloadTab(prewarm_browsers)
         self.validator_tab = ValidatorTab()
         
         self.stack.addWidget(self.download_tab)
@@ -69,6 +69,10 @@ class MainWindow(QMainWindow):
         # Mostrar pestaña de descarga por defecto
         self.show_download()
     
+    def closeEvent(self, event):
+        self.download_tab.shutdown()
+        super().closeEvent(event)
+
     def show_download(self):
         self.stack.setCurrentWidget(self.download_tab)
         self.download_btn.setProperty('active', True)
@@ -1,15 +1,16 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                             QFileDialog, QLabel, QProgressDialog, QTableWidget,
                             QTableWidgetItem, QMessageBox, QTabWidget, QComboBox,
-                            QHeaderView)
+                            QHeaderView, QSpinBox, QLineEdit)
 from PyQt5.QtCore import Qt
 import pandas as pd
 import os
-from PyPDF2 import PdfReader
-from core.pdf_processor import (process_factura_venta, process_factura_compra,
-                             process_nota_credito, process_nota_debito,
-                             process_facturas_compras_nuevos, process_facturas_gastos,
-                             process_inventory, get_document_type, COLUMN_HEADERS)
+from core.pdf_processor import COLUMN_HEADERS, DOCUMENT_SPECS
+from core.extraction_engine import ExtractionEngine, DEFAULT_WORKERS, AUTO_TYPE
+from core.worker_pool import DEFAULT_TIMEOUT
+from core.ubl_document import prefer_xml
+from core.extraction_cache import ExtractionCache
+from core.word_grid import ITEM_ENGINES, default_item_engine
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                              QFileDialog, QLabel, QProgressDialog, QTableWidget,
                              QTableWidgetItem, QMessageBox, QTabWidget, QComboBox,
@@ -20,6 +21,7 @@ class ValidatorTab(QWidget):
         self.setup_ui()
         self.files_to_process = []
         self.current_type = None
+        self.cache = None
         self.setup_data_containers()
 
     def setup_data_containers(self):
@@ -42,7 +44,7 @@ class ValidatorTab(QWidget):
         # Sección de instrucciones
         instructions = QLabel(
             "Pasos a seguir:\n"
-            "1. Seleccione los archivos PDF a procesar\n"
+            "1. Seleccione los archivos PDF (o XML de la DIAN) a procesar\n"
             "2. Elija el tipo de documento\n"
             "3. Haga clic en 'Procesar Documentos'"
         )
@@ -86,14 +88,10 @@ class ValidatorTab(QWidget):
         doc_type_label.setStyleSheet("font-size: 14px;")
         
         self.doc_type_combo = QComboBox()
-        self.doc_type_combo.addItems([
-            'Factura de Venta',
-            'Factura de Compra',
-            'Nota Crédito',
-            'Nota Débito',
-            'Facturas de Compras Nuevos',
-            'Facturas de Gastos'
-        ])
+        self.doc_type_combo.addItems(list(DOCUMENT_SPECS) + [AUTO_TYPE])
+        self.doc_type_combo.setToolTip(
+            f"{AUTO_TYPE}: detecta el tipo de cada PDF (lotes mezclados de ventas,\n"
+            "compras y notas); las facturas de gastos se tratan como compras")
         self.doc_type_combo.setStyleSheet("""
             QComboBox {
                 padding: 5px;
@@ -107,6 +105,50 @@ class ValidatorTab(QWidget):
         doc_type_layout.addWidget(doc_type_label)
         doc_type_layout.addWidget(self.doc_type_combo)
 
+        # NIT de la empresa: decide si una factura es de venta o de compra
+        self.own_nit_edit = QLineEdit()
+        self.own_nit_edit.setPlaceholderText("NIT propio (opcional)")
+        self.own_nit_edit.setToolTip(
+            "Si se deja vacío se usa el NIT que aparece en más documentos del lote")
+        self.own_nit_edit.setMaximumWidth(160)
+        self.own_nit_edit.setEnabled(False)
+        self.doc_type_combo.currentTextChanged.connect(
+            lambda text: self.own_nit_edit.setEnabled(text == AUTO_TYPE))
+        doc_type_layout.addWidget(self.own_nit_edit)
+
+        # Procesos que extraen PDFs en paralelo
+        workers_label = QLabel("Procesos:")
+        workers_label.setStyleSheet("font-size: 14px;")
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, max(DEFAULT_WORKERS, os.cpu_count() or 1))
+        self.workers_spin.setValue(DEFAULT_WORKERS)
+        self.workers_spin.setToolTip("Cantidad de procesos que extraen PDFs al mismo tiempo")
+        doc_type_layout.addWidget(workers_label)
+        doc_type_layout.addWidget(self.workers_spin)
+
+        # Tiempo máximo por documento: un PDF que se cuelga no detiene el lote
+        timeout_label = QLabel("Límite (s):")
+        timeout_label.setStyleSheet("font-size: 14px;")
+        self.timeout_spin = QSpinBox()
+        self.timeout_spin.setRange(10, 3600)
+        self.timeout_spin.setValue(DEFAULT_TIMEOUT)
+        self.timeout_spin.setToolTip("Segundos máximos por documento; si se excede, "
+                                     "el archivo pasa a errores y su proceso se reinicia")
+        doc_type_layout.addWidget(timeout_label)
+        doc_type_layout.addWidget(self.timeout_spin)
+
+        # Motor para leer las filas de ítems
+        engine_label = QLabel("Ítems:")
+        engine_label.setStyleSheet("font-size: 14px;")
+        self.item_engine_combo = QComboBox()
+        self.item_engine_combo.addItems(ITEM_ENGINES)
+        self.item_engine_combo.setCurrentText(default_item_engine())
+        self.item_engine_combo.setToolTip(
+            "tablas: detección de tablas de pdfplumber\n"
+            "palabras: ubica cada palabra en la cuadrícula de líneas (más rápido)")
+        doc_type_layout.addWidget(engine_label)
+        doc_type_layout.addWidget(self.item_engine_combo)
+
         # Botón de procesar
         self.process_btn = QPushButton('3. Procesar Documentos')
         self.process_btn.clicked.connect(self.process_files)
@@ -234,17 +276,22 @@ class ValidatorTab(QWidget):
             self.tab_widget.addTab(table, name.capitalize())
 
     def select_files(self):
-        """Permite al usuario seleccionar archivos PDF"""
+        """Permite al usuario seleccionar archivos PDF o XML UBL"""
         files, _ = QFileDialog.getOpenFileNames(
             self,
             "Seleccionar PDFs a procesar",
             "",
-            "PDF Files (*.pdf)"
+            "Documentos DIAN (*.pdf *.xml *.zip);;PDF Files (*.pdf);;XML UBL (*.xml *.zip)"
         )
         
         if files:
-            self.files_to_process = files
-            self.files_label.setText(f'Archivos seleccionados: {len(files)}')
+            # Si están el PDF y su XML, se usa el XML (datos exactos, sin layout)
+            self.files_to_process = prefer_xml(files)
+            text = f'Archivos seleccionados: {len(self.files_to_process)}'
+            replaced = len(files) - len(self.files_to_process)
+            if replaced:
+                text += f' ({replaced} PDF reemplazados por su XML)'
+            self.files_label.setText(text)
             self.process_btn.setEnabled(True)
 
     def process_files(self):
@@ -255,17 +302,7 @@ class ValidatorTab(QWidget):
 
         # Obtener el tipo de documento seleccionado
         doc_type = self.doc_type_combo.currentText()
-        processor_map = {
-            'Factura de Venta': process_factura_venta,
-            'Factura de Compra': process_factura_compra,
-            'Nota Crédito': process_nota_credito,
-            'Nota Débito': process_nota_debito,
-            'Facturas de Compras Nuevos': process_facturas_compras_nuevos,
-            'Facturas de Gastos': process_facturas_gastos
-        }
-
-        processor = processor_map.get(doc_type)
-        if not processor:
+        if doc_type not in DOCUMENT_SPECS and doc_type != AUTO_TYPE:
             QMessageBox.warning(self, "Error", "Tipo de documento no válido")
             return
 
@@ -278,82 +315,42 @@ class ValidatorTab(QWidget):
 
         processed = 0
         errors = 0
+        from_cache = 0
+        by_type = {}
 
-        # Mapeo de tipos de documento a claves de processed_data
-        type_to_key = {
-            'Factura de Venta': 'venta',
-            'Factura de Compra': 'compra',
-            'Nota Crédito': 'credito',
-            'Nota Débito': 'debito',
-            'Facturas de Compras Nuevos': 'compras_nuevos',
-            'Facturas de Gastos': 'gastos'
-        }
-
-        # Procesar cada archivo
-        for i, filepath in enumerate(self.files_to_process):
+        def wait_or_cancel():
+            # Mientras se espera un documento lento la ventana responde y
+            # "Cancelar" detiene los procesos sin esperar a que terminen
+            QApplication.processEvents()
             if progress.wasCanceled():
-                break
-
-            progress.setValue(i)
-            filename = os.path.basename(filepath)
-            progress.setLabelText(f"Procesando {i+1} de {len(self.files_to_process)}: {filename}")
-
-            try:
-                # Procesamiento basado en el tipo de documento
-                if doc_type == 'Factura de Compra':
-                    rows, descuentos = processor(filepath)
-                    inventory_items = process_inventory(filepath)
-                    
-                    if rows:
-                        self.processed_data['compra'].extend(rows)
-                        if descuentos:
-                            self.processed_data['descuentos'].extend(descuentos)
-                        if inventory_items:
-                            self.processed_data['inventario'].extend(inventory_items)
-                        processed += 1
-                    else:
-                        self.processed_data['errores'].append({
-                            'Archivo': filename,
-                            'Tipo': doc_type,
-                            'Error': 'No se pudo procesar'
-                        })
-                        errors += 1
-                else:
-                    # Para todos los demás tipos de documento
-                    rows = processor(filepath)
-                    if rows:
-                        # Usar el mapeo de tipos a claves
-                        key = type_to_key.get(doc_type)
-                        if key:
-                            self.processed_data[key].extend(rows)
-                            processed += 1
-                        else:
-                            self.processed_data['errores'].append({
-                                'Archivo': filename,
-                                'Tipo': doc_type,
-                                'Error': 'Tipo de documento no reconocido'
-                            })
-                            errors += 1
-                    else:
-                        self.processed_data['errores'].append({
-                            'Archivo': filename,
-                            'Tipo': doc_type,
-                            'Error': 'No se pudo procesar'
-                        })
-                        errors += 1
+                engine.cancel()
 
-            except Exception as e:
-                self.processed_data['errores'].append({
-                    'Archivo': filename,
-                    'Tipo': doc_type,
-                    'Error': str(e)
-                })
+        # Los archivos se extraen en paralelo; los ya procesados salen de la caché
+        engine = ExtractionEngine(self.workers_spin.value(), self.get_cache(),
+                                  self.item_engine_combo.currentText(),
+                                  self.own_nit_edit.text().strip(),
+                                  timeout=self.timeout_spin.value(),
+                                  on_wait=wait_or_cancel)
+        if doc_type == AUTO_TYPE:
+            progress.setLabelText("Clasificando documentos...")
+            QApplication.processEvents()
+        results = engine.extract(self.files_to_process, doc_type)
+        for i, result in enumerate(results):
+            if self.store_result(result):
+                processed += 1
+                from_cache += result.cached
+                by_type[result.doc_type] = by_type.get(result.doc_type, 0) + 1
+            else:
                 errors += 1
-                import traceback
-                traceback.print_exc()  # Imprimir el traceback completo
+
+            progress.setValue(i + 1)
+            progress.setLabelText(f"Procesado {i+1} de {len(self.files_to_process)}: {result.filename}")
 
             # Actualizar progreso después de cada archivo
             QApplication.processEvents()
+            if progress.wasCanceled():
+                results.close()
+                break
 
         progress.setValue(len(self.files_to_process))
         
@@ -362,13 +359,47 @@ class ValidatorTab(QWidget):
         self.export_btn.setEnabled(True)
         
         # Mostrar resumen
-        QMessageBox.information(self, "Completado", 
-            f"Proceso finalizado:\n"
+        detail = ""
+        if doc_type == AUTO_TYPE:
+            detail = "".join(f"  {name}: {count}\n" for name, count in by_type.items())
+            detail += f"NIT propio: {engine.resolved_nit or 'no determinado'}\n"
+        canceled = progress.wasCanceled()
+        QMessageBox.information(self, "Cancelado" if canceled else "Completado", 
+            f"Proceso {'cancelado' if canceled else 'finalizado'}:\n"
             f"Total archivos: {len(self.files_to_process)}\n"
             f"Procesados exitosamente: {processed}\n"
+            f"{detail}"
+            f"Desde caché: {from_cache}\n"
             f"Errores: {errors}"
         )
 
+    def get_cache(self):
+        """Caché de extracción compartida; None si no se puede abrir"""
+        if self.cache is None:
+            try:
+                self.cache = ExtractionCache()
+            except Exception as e:
+                print(f"No se pudo abrir la caché de extracción: {str(e)}")
+                return None
+        return self.cache
+
+    def store_result(self, result):
+        """Agrega un ExtractionResult a processed_data; retorna False si fue un error"""
+        if result.error:
+            self.processed_data['errores'].append({
+                'Archivo': result.filename,
+                'Tipo': result.doc_type,
+                'Error': result.error
+            })
+            return False
+
+        self.processed_data[result.key].extend(result.rows)
+        if result.descuentos:
+            self.processed_data['descuentos'].extend(result.descuentos)
+        if result.inventory:
+            self.processed_data['inventario'].extend(result.inventory)
+        return True
+
     def update_tables(self):
         """Actualiza las tablas con los datos procesados"""
         for data_type, data in self.processed_data.items():